@@ -0,0 +1,107 @@
+import os
+import numpy as np
+import pandas as pd
+import concurrent.futures
+from pathlib import Path
+from ats.tokens import tokenizer_tool
+from ats.bm25_index import bm25_index_tool
+from ats.jaccard_index import jaccard_index_tool
+from ats.sharded_scoring import LexicalShards, lexical_shards_tool
+from ats.scorer import index_pool, compute_score_matrices, group_max
+from ats.ranking import fuse_scores, top_indices, TOP_N, MIN_RAW_SCORE, RAW_WEIGHTS, FINAL_WEIGHTS
+from ats.vector_index import VectorIndex
+from ats.helper import generate_multiqueries, METADATA_FIELDS
+from tools.storage import cache_path_tool
+from tools.metrics import metrics_tool, submit_in_context
+
+MAX_JD_WORKERS = 8
+
+def rank_batch(docs, jd_texts, client, job_schema, embed_model, top_n=TOP_N, min_raw_score=MIN_RAW_SCORE, n=4,
+               raw_weights=RAW_WEIGHTS, final_weights=FINAL_WEIGHTS):
+    # Rank one candidate pool against many JDs, candidate-side work (tokens, indexes, embeddings) happens once
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_JD_WORKERS + 1) as executor:
+        pool_future = submit_in_context(executor, index_pool, docs, embed_model)
+        multiquery_futures = [submit_in_context(executor, generate_multiqueries, client, job_schema, jd, n) for jd in jd_texts]
+        multiquery_groups = [future.result() for future in multiquery_futures]
+        pool_index = pool_future.result()
+
+    matrices = compute_score_matrices(docs, multiquery_groups, embed_model, pool_index)
+    return fuse_batch(*matrices, top_n, min_raw_score, raw_weights, final_weights)
+
+def fuse_batch(bm25_matrix, jaccard_matrix, node_matrix, top_n=TOP_N, min_raw_score=MIN_RAW_SCORE,
+               raw_weights=RAW_WEIGHTS, final_weights=FINAL_WEIGHTS):
+    # Fusion keeps the single-JD semantics: per-JD strong-resume filter and min-max normalization
+    rankings = []
+    for j in range(len(bm25_matrix)):
+        valid_idx, final_scores, strong = fuse_scores(
+            bm25_matrix[j], jaccard_matrix[j], node_matrix[j], min_raw_score, raw_weights, final_weights
+        )
+        reranked_idx = top_indices(final_scores, top_n)
+        rankings.append({
+            "indices": valid_idx[reranked_idx],
+            "scores": final_scores[reranked_idx],
+            "strong_count": len(valid_idx) if strong else 0,
+            "scored_count": bm25_matrix.shape[1],
+        })
+    return rankings
+
+# Ranking service snapshot: the server writes the pool's vector rows and lexical shard set once per pool version,
+# worker processes memory-map both and never hold a corpus, an index or the documents themselves
+def snapshot_path():
+    return cache_path_tool("service", "snapshot.npz")
+
+def save_snapshot(version, docs, pool_index):
+    # Server side, after index_pool: the shard set is built (or reused) from this process's indexes
+    corpus = tokenizer_tool().corpus([doc.text_resource.text for doc in docs])
+    shards = lexical_shards_tool(corpus, bm25_index_tool(corpus), jaccard_index_tool(corpus))
+    _, doc_rows = pool_index
+
+    # Written whole and renamed, workers may be loading the previous snapshot
+    path = snapshot_path()
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(f, version=version, doc_rows=doc_rows, shard_dir=str(shards.dir))
+    os.replace(tmp_path, path)
+
+_snapshot = None
+
+def load_snapshot(version, model_name):
+    # Worker side, loaded once per pool version. None when the saved snapshot is for another version
+    global _snapshot
+    if _snapshot is None or _snapshot[0] != version:
+        path = snapshot_path()
+        if not path.exists():
+            return None
+        with np.load(path) as saved:
+            if int(saved["version"]) != version:
+                return None
+            doc_rows, shard_dir = saved["doc_rows"], str(saved["shard_dir"])
+
+        # A fresh read of the vectors the server just extended, workers never embed or append
+        _snapshot = (version, LexicalShards(Path(shard_dir)), VectorIndex(model_name), doc_rows)
+    return _snapshot[1:]
+
+def score_snapshot(version, model_name, multiquery_groups, query_vectors, top_n=TOP_N, min_raw_score=MIN_RAW_SCORE):
+    # None tells the server the pool moved past the version it prepared, it re-prepares and retries
+    snapshot = load_snapshot(version, model_name)
+    if snapshot is None:
+        return None
+    shards, vector_index, doc_rows = snapshot
+    group_sizes = [len(group) for group in multiquery_groups]
+    query_tokens = tokenizer_tool().queries([q for group in multiquery_groups for q in group])
+
+    with metrics_tool().span("lexical_scores", count=shards.num_docs, queries=len(query_tokens)):
+        bm25, jaccard = shards.matrices(query_tokens)
+    with metrics_tool().span("vector_scores", count=len(doc_rows), queries=len(query_tokens)):
+        similarities = query_vectors @ np.asarray(vector_index.vectors[doc_rows]).T
+    matrices = [group_max(scores, group_sizes) for scores in (bm25, jaccard, similarities)]
+    return fuse_batch(*matrices, top_n, min_raw_score)
+
+def rankings_to_dataframe(docs, jd_names, rankings):
+    rows = []
+    for jd_name, ranking in zip(jd_names, rankings):
+        for rank, (i, score) in enumerate(zip(ranking["indices"], ranking["scores"]), start=1):
+            row = {"JD": jd_name, "Rank": rank, "Score": round(float(score), 2)}
+            row.update({field: docs[i].metadata.get(field, '') for field in METADATA_FIELDS})
+            rows.append(row)
+    return pd.DataFrame(rows)
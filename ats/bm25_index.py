@@ -0,0 +1,72 @@
+import threading
+import numpy as np
+import scipy.sparse as sp
+
+K1 = 1.5
+B = 0.75
+
+class BM25Index:
+    # Lucene BM25 (the bm25s default) over the pool's cached postings. Saturated term frequencies form a
+    # (vocab x docs) matrix and IDF rides on the query matrix, so a changed pool costs a few vectorized passes
+
+    def __init__(self, corpus, k1=K1, b=B):
+        self.vocab = corpus.vocab
+        self.num_docs = len(corpus)
+        num_terms = int(corpus.ids.max()) + 1 if len(corpus.ids) else 0
+
+        doc_lengths = corpus.doc_lengths().astype(np.float32)
+        avg_length = doc_lengths.mean() if doc_lengths.sum() else 1.0
+        length_norm = k1 * ((1 - b) + b * doc_lengths / avg_length)
+
+        tf = corpus.counts.astype(np.float32)
+        saturated = tf / (np.repeat(length_norm, corpus.doc_sizes()) + tf)
+        self.matrix = sp.csr_matrix((saturated, corpus.ids, corpus.offsets), shape=(self.num_docs, num_terms)).T.tocsr()
+
+        doc_freq = np.bincount(corpus.ids, minlength=num_terms)
+        self.idf = np.log(1 + (self.num_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+    def query_matrix(self, query_tokens):
+        # (queries x vocab) IDF weights of each query's distinct terms, terms the pool never uses are dropped
+        num_terms = self.matrix.shape[0]
+        rows, cols = [], []
+
+        for i, tokens in enumerate(query_tokens):
+            ids = {self.vocab.ids[t] for t in tokens if self.vocab.ids.get(t, num_terms) < num_terms}
+            rows.extend([i] * len(ids))
+            cols.extend(ids)
+
+        data = self.idf[np.asarray(cols, dtype=np.int64)]
+        return sp.csr_matrix((data, (rows, cols)), shape=(len(query_tokens), num_terms))
+
+    def score(self, query_tokens):
+        # (queries x docs) BM25 scores in a single sparse product
+        return np.asarray((self.query_matrix(query_tokens) @ self.matrix).todense())
+
+    def chunk_scorer(self, query_tokens):
+        # Keeps only the query terms' postings, column-sliceable, so each doc chunk costs O(its postings)
+        query_matrix = self.query_matrix(query_tokens)
+        term_ids = np.unique(query_matrix.indices)
+        postings = self.matrix[term_ids].tocsc()
+        query_terms = query_matrix[:, term_ids]
+        return lambda start, end: np.asarray((query_terms @ postings[:, start:end]).todense())
+
+    def max_scores(self, query_tokens):
+        if not query_tokens:
+            return np.zeros(self.num_docs)
+        return self.score(query_tokens).max(axis=0)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def bm25_index_tool(corpus):
+    # In-memory only, built once and reused across JDs while the set of resumes is unchanged. What persists is
+    # per document: postings in tokens.sqlite, appended as new resumes arrive. A pool change rebuilds this index
+    # from them (O(total postings), no re-tokenizing), since length normalization and IDF are pool-wide.
+    # The read-only on-disk copy for other processes is the lexical shard set, written per pool content
+    key = corpus.key
+
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes.clear()  # only the current pool is kept in memory
+            _indexes[key] = BM25Index(corpus)
+        return _indexes[key]
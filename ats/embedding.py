@@ -0,0 +1,55 @@
+import concurrent.futures
+from tools.metrics import metrics_tool, submit_in_context
+
+MAX_BATCH_TOKENS = 200_000  # OpenAI caps a single embeddings request at 300k tokens
+MAX_IN_FLIGHT = 4
+
+def estimate_tokens(text):
+    # Rough tiktoken-free estimate, English text averages ~4 characters per token
+    return len(text) // 4 + 1
+
+def make_batches(texts, max_batch_tokens=MAX_BATCH_TOKENS, max_batch_size=100):
+    # Greedily pack consecutive texts into batches bounded by token estimate and item count
+    batch, batch_tokens = [], 0
+
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if batch and (batch_tokens + tokens > max_batch_tokens or len(batch) >= max_batch_size):
+            yield batch
+            batch, batch_tokens = [], 0
+
+        batch.append(i)
+        batch_tokens += tokens
+
+    if batch:
+        yield batch
+
+def embed_batch(embed_model, texts):
+    with metrics_tool().span("embedding_batch", count=len(texts), bytes=sum(len(text) for text in texts)):
+        return embed_model.get_text_embedding_batch(texts)
+
+def embed_texts(embed_model, texts, max_batch_tokens=MAX_BATCH_TOKENS, max_batch_size=None, max_in_flight=MAX_IN_FLIGHT):
+    # One request per batch, several batches in flight, output order matches input order
+    texts = list(texts)
+    if not texts:
+        return []
+
+    if not hasattr(embed_model, "get_text_embedding_batch"):
+        return [embed_model.get_text_embedding(text) for text in texts]
+
+    # Never exceed the model's own batch size, otherwise llama-index splits the batch into sequential calls
+    max_batch_size = max_batch_size or getattr(embed_model, "embed_batch_size", 100)
+    batches = list(make_batches(texts, max_batch_tokens, max_batch_size))
+    embeddings = [None] * len(texts)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_in_flight, len(batches))) as executor:
+        futures = {
+            submit_in_context(executor, embed_batch, embed_model, [texts[i] for i in batch]): batch
+            for batch in batches
+        }
+
+        for future in concurrent.futures.as_completed(futures):
+            for i, embedding in zip(futures[future], future.result()):
+                embeddings[i] = embedding
+
+    return embeddings
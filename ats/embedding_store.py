@@ -0,0 +1,92 @@
+import re
+import hashlib
+import threading
+import numpy as np
+from tools.storage import cache_path_tool
+
+KEY_BYTES = 32
+
+class EmbeddingStore:
+    # Append-only float32 matrix on disk plus a raw sha256 key file, memory-mapped on load
+
+    def __init__(self, model_name, root=None):
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+        self.dir = root or cache_path_tool("embeddings", safe_name, "vectors.f32").parent
+        self.vectors_path = self.dir / "vectors.f32"
+        self.keys_path = self.dir / "keys.bin"
+        self.dim_path = self.dir / "dim"
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        keys = self.keys_path.read_bytes() if self.keys_path.exists() else b""
+        vector_bytes = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        self.dim = int(self.dim_path.read_text()) if self.dim_path.exists() else 0
+
+        # A crash between the two appends can leave the files uneven, only rows present in both count
+        count = min(len(keys) // KEY_BYTES, vector_bytes // (4 * self.dim)) if self.dim else 0
+
+        self.index = {keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]: i for i in range(count)}
+        self.count = count
+        self._vectors = None
+        if count:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, self.dim))
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def text_key(text):
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def _append(self, keys, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if not self.dim:
+            self.dim = vectors.shape[1]
+            self.dim_path.write_text(str(self.dim))
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dim}")
+
+        with open(self.vectors_path, "ab") as f:
+            f.seek(self.count * self.dim * 4)
+            f.truncate()
+            f.write(vectors.tobytes())
+        with open(self.keys_path, "ab") as f:
+            f.seek(self.count * KEY_BYTES)
+            f.truncate()
+            f.write(b"".join(keys))
+
+        for offset, key in enumerate(keys):
+            self.index[key] = self.count + offset
+        self.count += len(keys)
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+
+    def get_or_embed(self, texts, embed_fn):
+        # Returns a (len(texts), dim) matrix, only texts never seen before are sent to embed_fn
+        keys = [self.text_key(text) for text in texts]
+
+        with self._lock:
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in self.index and key not in missing:
+                    missing[key] = text
+
+            if missing:
+                new_vectors = np.asarray(embed_fn(list(missing.values())), dtype=np.float32)
+                self._append(list(missing.keys()), new_vectors)
+
+            rows = np.fromiter((self.index[key] for key in keys), dtype=np.int64, count=len(keys))
+            if not len(rows):
+                return np.zeros((0, self.dim), dtype=np.float32)
+            return np.asarray(self._vectors[rows])
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def embedding_store_tool(model_name):
+    # One store per embedding model, shared by every session in the process
+    with _stores_lock:
+        if model_name not in _stores:
+            _stores[model_name] = EmbeddingStore(model_name)
+        return _stores[model_name]
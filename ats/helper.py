@@ -1,4 +1,14 @@
+import os
+import re
 import json
+import time
+import uuid
+from llama_index.core import Document
+from tools.storage import cache_path_tool, sha256_text
+from tools.metrics import record_llm_call
+
+MULTIQUERY_MODEL = "gpt-4.1-mini-2025-04-14"
+METADATA_FIELDS = ["Name", "Email", "Phone", "Education", "Job Title", "Experience", "resume_path", "file_name"]
 
 def row_to_text(row):
     fields = [
@@ -19,21 +29,54 @@ def row_to_text(row):
     
     return "\n".join(fields)
 
+def build_documents(dataframe):
+    # Parsed data to Llamaindex Documents
+    return [
+        Document(
+            text=row_to_text(row),
+            metadata={field: row.get(field, '') for field in METADATA_FIELDS}  # pool rows from before file_name lack it
+        )
+        for _, row in dataframe.iterrows()
+    ]
+
+def normalize_jd(jd):
+    return re.sub(r"\s+", " ", jd).strip().lower()
+
 def generate_multiqueries(client, tools_jd, jd, n):
+    # Variants are cached per normalized JD, model and count, so re-ranking a JD skips the LLM call
+    key = sha256_text("\n".join([normalize_jd(jd), MULTIQUERY_MODEL, str(n), json.dumps(tools_jd, sort_keys=True)]))
+    cache_file = cache_path_tool("multiqueries", f"{key}.json")
+    if cache_file.exists():
+        with open(cache_file, 'r') as file:
+            return json.load(file)
+
+    multiqueries = request_multiqueries(client, tools_jd, jd, n)
+    tmp_file = cache_file.with_suffix(f".{os.getpid()}.{uuid.uuid4().hex}.tmp")  # private per writer, the UI and the service share keys
+    with open(tmp_file, 'w') as file:
+        json.dump(multiqueries, file)
+    os.replace(tmp_file, cache_file)
+    return multiqueries
+
+def request_multiqueries(client, tools_jd, jd, n):
     prompt = f"""
                     Given the following job description, generate {n} alternative job descriptions using different synonyms and varied phrasing to capture a broader range of keywords for resume matching. 
                     Each alternative should maintain the original responsibilities and be approximately the same length as the original description. Return the output in the specified function format.
               """
 
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini-2025-04-14",
-        messages=[
-            {"role": "user", "content": prompt + "\n" + jd}
-        ],
-        temperature=0.1,
-        tools=tools_jd,
-        tool_choice={"type": "function", "function": {"name": "generate_jd_variants"}}
-    )
+    messages = [{"role": "user", "content": prompt + "\n" + jd}]
+    start = time.perf_counter()
+    try:
+        response = client.chat.completions.create(
+            model=MULTIQUERY_MODEL,
+            messages=messages,
+            temperature=0.1,
+            tools=tools_jd,
+            tool_choice={"type": "function", "function": {"name": "generate_jd_variants"}}
+        )
+    except Exception:
+        record_llm_call(start, MULTIQUERY_MODEL, "multiquery", len(json.dumps(messages)), status="error")
+        raise
+    record_llm_call(start, MULTIQUERY_MODEL, "multiquery", len(json.dumps(messages)), response=response)
 
     jd_dict = json.loads(response.choices[0].message.tool_calls[0].function.arguments)
     return [jd_dict['original_jd']] + jd_dict['variant_jds']
\ No newline at end of file
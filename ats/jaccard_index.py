@@ -0,0 +1,61 @@
+import threading
+import numpy as np
+import scipy.sparse as sp
+
+class JaccardIndex:
+    # Binary (docs x vocab) matrix of the pool, intersections for all queries come from one product
+
+    def __init__(self, corpus):
+        self.vocab = corpus.vocab
+        self.num_docs = len(corpus)
+        num_terms = int(corpus.ids.max()) + 1 if len(corpus.ids) else 0
+
+        # Corpus postings are already distinct and sorted per document, so they are the CSR as-is
+        data = np.ones(len(corpus.ids), dtype=np.float32)
+        self.matrix = sp.csr_matrix((data, corpus.ids, corpus.offsets), shape=(self.num_docs, num_terms))
+        self.doc_sizes = corpus.doc_sizes().astype(np.float32)
+
+    def query_matrix(self, query_tokens):
+        # Query sizes count every distinct term, including ones the pool never uses
+        rows, cols = [], []
+        sizes = np.zeros(len(query_tokens), dtype=np.float32)
+        num_terms = self.matrix.shape[1]
+
+        for i, tokens in enumerate(query_tokens):
+            terms = set(tokens)
+            ids = [self.vocab.ids[t] for t in terms if self.vocab.ids.get(t, num_terms) < num_terms]
+            sizes[i] = len(terms)
+            rows.extend([i] * len(ids))
+            cols.extend(ids)
+
+        data = np.ones(len(rows), dtype=np.float32)
+        return sp.csr_matrix((data, (rows, cols)), shape=(len(query_tokens), num_terms)), sizes
+
+    def score(self, query_tokens, rows=None):
+        # (queries x docs) Jaccard similarity, 1.0 when both sides are empty like the sklearn loop
+        matrix, doc_sizes = (self.matrix, self.doc_sizes) if rows is None else (self.matrix[rows], self.doc_sizes[rows])
+        query_matrix, query_sizes = self.query_matrix(query_tokens)
+        intersection = np.asarray((query_matrix @ matrix.T).todense())
+        union = query_sizes[:, None] + doc_sizes[None, :] - intersection
+
+        scores = np.ones_like(intersection)
+        np.divide(intersection, union, out=scores, where=union > 0)
+        return scores
+
+    def max_scores(self, query_tokens, rows=None):
+        if not query_tokens:
+            return np.zeros(self.num_docs if rows is None else len(rows))
+        return self.score(query_tokens, rows).max(axis=0)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def jaccard_index_tool(corpus):
+    # Pool matrix is built once and reused across JDs while the set of resumes is unchanged
+    key = corpus.key
+
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes.clear()
+            _indexes[key] = JaccardIndex(corpus)
+        return _indexes[key]
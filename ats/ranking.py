@@ -0,0 +1,169 @@
+import os
+import numpy as np
+import concurrent.futures
+from ats.tokens import tokenizer_tool
+from ats.bm25_index import bm25_index_tool
+from ats.jaccard_index import jaccard_index_tool
+from ats.helper import generate_multiqueries
+from ats.scorer import compute_bm25_filtered_scores, compute_jaccard_filtered_scores, compute_lexical_filtered_scores, index_pool, embed_queries
+from tools.metrics import metrics_tool, submit_in_context
+
+TOP_N = 15
+MIN_RAW_SCORE = 25
+PREFILTER_K = int(os.getenv("PREFILTER_K", 500))  # 0 scores every candidate
+CHUNK_SIZE = 50_000
+
+# Signal weights, ordered (bm25, jaccard, node)
+RAW_WEIGHTS = np.array([0.3, 20, 50])
+FINAL_WEIGHTS = np.array([0.3, 0.2, 0.5])
+
+# Normalize scores between 1-100
+def normalize(arr):
+    arr = np.array(arr)
+    if np.ptp(arr) < 1e-8:
+        # If all values are the same (or only one entry), set to 1
+        return np.ones_like(arr)
+    return (arr - np.min(arr)) / (np.ptp(arr) + 1e-8)
+
+def prepare_ranking(docs, jd_text, client, job_schema, embed_model, n=4):
+    # Multiquery generation (chat API) and candidate embedding (embeddings API) are independent, so they overlap
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        multiqueries = submit_in_context(executor, generate_multiqueries, client, job_schema, jd_text, n)
+        pool_index = submit_in_context(executor, index_pool, docs, embed_model)
+        return multiqueries.result(), pool_index.result()
+
+def score_jd(docs, jd_text, client, job_schema, embed_model, prefilter_k=PREFILTER_K, on_progress=None):
+    # Headless single-JD scoring shared by the UI and the CLI, on_progress(fraction, message) is optional
+    report = on_progress or (lambda fraction, message: None)
+
+    # Multiquery generation and resume embedding run at the same time, both are cached
+    report(0.0, "Generating semantic multiqueries from JD and indexing resumes...")
+    multiqueries, pool_index = prepare_ranking(docs, jd_text, client, job_schema, embed_model)
+
+    # Scoring resumes: BM25 prefilter, then Jaccard and embeddings for the top-K only
+    report(0.3, "Computing resume scores...")
+    components = score_components(docs, multiqueries, embed_model, prefilter_k, pool_index)
+    report(0.8, "Resume scores ready")
+    return components, multiqueries, pool_index
+
+def prefilter_candidates(bm25_scores, k):
+    # Indices of the k best BM25 candidates in pool order, everyone when k is off or covers the pool
+    if not k or k >= len(bm25_scores):
+        return np.arange(len(bm25_scores))
+    return np.sort(np.argpartition(-bm25_scores, k - 1)[:k])
+
+def score_candidates(docs, multiqueries, embed_model, prefilter_k=PREFILTER_K, pool_index=None):
+    # Candidates are BM25's top-K plus the vector index's top-K, only they get Jaccard and exact embedding scores
+    vector_index, doc_rows = pool_index or index_pool(docs, embed_model)
+    query_vectors = embed_queries(multiqueries, embed_model)
+
+    if not prefilter_k or prefilter_k >= len(docs):
+        # Everyone is scored, BM25 and Jaccard come from one pass over the pool
+        candidate_idx = np.arange(len(docs))
+        bm25_scores, jaccard_scores = compute_lexical_filtered_scores(docs, multiqueries)
+    else:
+        bm25_scores = compute_bm25_filtered_scores(docs, multiqueries)
+        candidate_idx = prefilter_candidates(bm25_scores, prefilter_k)
+        if len(candidate_idx) < len(docs):
+            ann_idx, _ = vector_index.search(query_vectors, prefilter_k, doc_rows)
+            candidate_idx = np.union1d(candidate_idx, ann_idx)
+
+        candidate_texts = [doc.text_resource.text for doc in docs]
+        jaccard_scores = compute_jaccard_filtered_scores(multiqueries, candidate_texts, rows=candidate_idx)
+    with metrics_tool().span("vector_scores", count=len(candidate_idx)):
+        node_scores = vector_index.similarity(query_vectors, doc_rows[candidate_idx])
+    return candidate_idx, bm25_scores[candidate_idx], jaccard_scores, node_scores
+
+def score_components(docs, multiqueries, embed_model, prefilter_k=PREFILTER_K, pool_index=None):
+    # Per-candidate signal vectors for one JD, everything after this is cheap to redo with other weights
+    if (not prefilter_k or prefilter_k >= len(docs)) and len(docs) > CHUNK_SIZE:
+        signals = np.zeros((len(docs), 3))
+        for start, end, chunk in iter_chunk_signals(docs, multiqueries, embed_model, pool_index=pool_index):
+            signals[start:end] = chunk
+        candidate_idx, (bm25_scores, jaccard_scores, node_scores) = np.arange(len(docs)), signals.T
+    else:
+        candidate_idx, bm25_scores, jaccard_scores, node_scores = score_candidates(docs, multiqueries, embed_model, prefilter_k, pool_index)
+
+    return {
+        "candidate_idx": candidate_idx,
+        "bm25": np.asarray(bm25_scores, dtype=np.float64),
+        "jaccard": np.asarray(jaccard_scores, dtype=np.float64),
+        "node": np.asarray(node_scores, dtype=np.float64),
+    }
+
+def fuse_scores(bm25_scores, jaccard_scores, node_scores, min_raw_score=MIN_RAW_SCORE, raw_weights=RAW_WEIGHTS, final_weights=FINAL_WEIGHTS):
+    with metrics_tool().span("fusion", count=len(bm25_scores)):
+        raw_scores = np.column_stack([bm25_scores, jaccard_scores, node_scores]) @ np.asarray(raw_weights)
+
+        # Filtering according to high-matching resumes, fallback mechanism to show all
+        valid_idx = np.flatnonzero(raw_scores > min_raw_score)
+        strong = len(valid_idx) > 0
+        if not strong:
+            valid_idx = np.arange(len(raw_scores))
+
+        # Normalizing scores for easy visuals
+        bm25_norm = normalize(bm25_scores[valid_idx])
+        jaccard_norm = normalize(jaccard_scores[valid_idx])
+        node_norm = normalize(node_scores[valid_idx])
+
+        final_scores = np.column_stack([bm25_norm, jaccard_norm, node_norm]) @ np.asarray(final_weights) * 100
+        return valid_idx, np.clip(final_scores, 0, 100), strong
+
+def top_indices(scores, k):
+    # Positions of the k best scores, best first, without sorting the rest of the pool
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+def rerank_components(components, top_n=TOP_N, min_raw_score=MIN_RAW_SCORE, raw_weights=RAW_WEIGHTS, final_weights=FINAL_WEIGHTS):
+    # Fusion and top-N from cached component vectors, no tokenizing, embedding or LLM calls
+    candidate_idx = components["candidate_idx"]
+    valid_idx, final_scores, strong = fuse_scores(
+        components["bm25"], components["jaccard"], components["node"], min_raw_score, raw_weights, final_weights
+    )
+
+    # Reranking candidates according to combined scores, only the top N are sorted
+    reranked_idx = top_indices(final_scores, top_n)
+    return {
+        "indices": candidate_idx[valid_idx[reranked_idx]],
+        "scores": final_scores[reranked_idx],
+        "strong_count": len(valid_idx) if strong else 0,
+        "scored_count": len(candidate_idx),
+    }
+
+def rank_candidates(docs, multiqueries, embed_model, top_n=TOP_N, min_raw_score=MIN_RAW_SCORE, prefilter_k=PREFILTER_K,
+                    pool_index=None, raw_weights=RAW_WEIGHTS, final_weights=FINAL_WEIGHTS):
+    # Same path as the UI and the CLI, score_jd's components then rerank_components
+    components = score_components(docs, multiqueries, embed_model, prefilter_k, pool_index)
+    return rerank_components(components, top_n, min_raw_score, raw_weights, final_weights)
+
+def ranking_recall(cascade, full):
+    # Share of the full-scoring top-N that the cascade also returned
+    expected = set(full["indices"].tolist())
+    if not expected:
+        return 1.0
+    return len(expected & set(cascade["indices"].tolist())) / len(expected)
+
+def iter_chunk_signals(docs, multiqueries, embed_model, chunk_size=CHUNK_SIZE, pool_index=None):
+    # Yields (start, end, chunk x 3 signals) over the whole pool, never materializing a queries x pool matrix.
+    # Only those products are bounded per chunk: the lexical indexes and the (pool x 3) signals the caller
+    # collects are pool-sized
+    vector_index, doc_rows = pool_index or index_pool(docs, embed_model)
+    query_vectors = embed_queries(multiqueries, embed_model)
+
+    tokenizer = tokenizer_tool()
+    corpus = tokenizer.corpus([doc.text_resource.text for doc in docs])
+    query_tokens = tokenizer.queries(multiqueries)
+    bm25_chunk = bm25_index_tool(corpus).chunk_scorer(query_tokens)
+    jaccard_index = jaccard_index_tool(corpus)
+
+    for start in range(0, len(docs), chunk_size):
+        end = min(start + chunk_size, len(docs))
+        with metrics_tool().span("chunk_signals", count=end - start):
+            signals = np.column_stack([
+                bm25_chunk(start, end).max(axis=0),
+                jaccard_index.score(query_tokens, slice(start, end)).max(axis=0),
+                vector_index.similarity(query_vectors, doc_rows[start:end]),
+            ])
+        yield start, end, signals
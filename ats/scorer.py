@@ -1,108 +1,114 @@
-import nltk
-import bm25s
-import string
-import Stemmer
 import numpy as np
-from nltk.corpus import stopwords
-from sklearn.metrics import jaccard_score
-from sklearn.feature_extraction.text import CountVectorizer
-
-nltk.download('stopwords')
-stemmer = Stemmer.Stemmer("english")
-STOPWORDS = set(stopwords.words('english'))
+from ats.embedding import embed_texts
+from ats.bm25_index import bm25_index_tool
+from ats.jaccard_index import JaccardIndex, jaccard_index_tool
+from ats.vector_index import vector_index_tool
+from ats.embedding_store import embedding_store_tool
+from ats.tokens import tokenizer_tool
+from ats.sharded_scoring import lexical_shards_tool, MIN_SHARDED_DOCS
+from tools.metrics import metrics_tool
 
 def unit_normalize(x):
     return x / (np.linalg.norm(x, axis=-1, keepdims=True) + 1e-8)
 
-def remove_stopwords_and_stem(text):
-    text = text.lower()
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    tokens = text.split()
-    tokens = [t for t in tokens if t not in STOPWORDS]
-    stems = stemmer.stemWords(tokens)
-    return ' '.join(stems)
-
-def compute_node_scores(docs, multiqueries, embed_model):
-    node_scores = []
-
-    for doc in docs:
-        doc_embedding = embed_model.get_text_embedding(doc.text_resource.text)
-        similarities = [
-            embed_model.similarity(doc_embedding, embed_model.get_text_embedding(mq))
-            for mq in multiqueries
-        ]
-
-        node_scores.append(max(similarities))
-    return np.array(node_scores)
-
-def compute_node_scores(docs, multiqueries, embed_model):
-    multiquery_embeddings = np.stack([
-        embed_model.get_text_embedding(mq)
-        for mq in multiqueries
-    ])
-
-    doc_texts = [doc.text_resource.text for doc in docs]
-    doc_embeddings = np.stack([
-        embed_model.get_text_embedding(doc_text)
-        for doc_text in doc_texts
-    ])
-
-    doc_embeddings_norm = unit_normalize(doc_embeddings)
-    multiquery_embeddings_norm = unit_normalize(multiquery_embeddings)
-
-    similarities = np.dot(doc_embeddings_norm, multiquery_embeddings_norm.T)
-    node_scores = similarities.max(axis=1)
-    return node_scores
+def embedding_model_name(embed_model):
+    return getattr(embed_model, "model_name", type(embed_model).__name__)
+
+def index_pool(docs, embed_model):
+    # Vector-index rows of the pool, cached vectors come from the memory-mapped store and only unseen texts hit the API
+    model_name = embedding_model_name(embed_model)
+    store = embedding_store_tool(model_name)
+    vector_index = vector_index_tool(model_name)
+
+    embed_fn = lambda texts: store.get_or_embed(texts, lambda missing: embed_texts(embed_model, missing))
+    with metrics_tool().span("index_pool", count=len(docs)):
+        doc_rows = vector_index.ensure([doc.text_resource.text for doc in docs], embed_fn)
+    return vector_index, doc_rows
+
+def embed_queries(multiqueries, embed_model):
+    store = embedding_store_tool(embedding_model_name(embed_model))
+    with metrics_tool().span("embed_queries", count=len(multiqueries)):
+        embeddings = store.get_or_embed(list(multiqueries), lambda texts: embed_texts(embed_model, texts))
+    return unit_normalize(embeddings)
+
+def compute_node_scores(docs, multiqueries, embed_model, rows=None, pool_index=None):
+    vector_index, doc_rows = pool_index or index_pool(docs, embed_model)
+    doc_rows = doc_rows if rows is None else doc_rows[rows]
+    query_vectors = embed_queries(multiqueries, embed_model)
+
+    # Max cosine similarity over multiqueries
+    with metrics_tool().span("vector_scores", count=len(doc_rows)):
+        return vector_index.similarity(query_vectors, doc_rows)
+
+def sharded_lexical_scores(corpus, query_tokens, jaccard=True):
+    # Large pools are scored shard by shard in worker processes, IDF comes from the pool-wide BM25 index
+    bm25_index = bm25_index_tool(corpus)
+    jaccard_index = jaccard_index_tool(corpus)
+    return lexical_shards_tool(corpus, bm25_index, jaccard_index).score(query_tokens, jaccard)
 
 def compute_bm25_filtered_scores(docs, multiqueries):
+    tokenizer = tokenizer_tool()
+    corpus = tokenizer.corpus([doc.text for doc in docs])
+    query_tokens = tokenizer.queries(multiqueries)
 
-    corpus = [remove_stopwords_and_stem(doc.text) for doc in docs]
-    corpus_tokens = bm25s.tokenize(corpus, stopwords=None, stemmer=None)
-    
-    retriever = bm25s.BM25()
-    retriever.index(corpus_tokens)
-
-    bm25_multi_scores = []
-    for q in multiqueries:
-        query_processed = remove_stopwords_and_stem(q)
-        query_tokens = bm25s.tokenize(query_processed, stopwords=None, stemmer=None)
+    with metrics_tool().span("bm25", count=len(corpus), sharded=len(corpus) >= MIN_SHARDED_DOCS):
+        if query_tokens and len(corpus) >= MIN_SHARDED_DOCS:
+            return sharded_lexical_scores(corpus, query_tokens, jaccard=False)[0]
 
-        all_scores = retriever.get_scores(list(query_tokens[1]))
-        bm25_multi_scores.append(all_scores)
+        # Max over multiqueries, scored together in one sparse product
+        return bm25_index_tool(corpus).max_scores(query_tokens)
 
-    bm25_multi_scores = np.array(bm25_multi_scores)
-    bm25_all = np.max(bm25_multi_scores, axis=0)
+def compute_lexical_filtered_scores(docs, multiqueries):
+    # BM25 and Jaccard for the whole pool, a sharded pool is scored once for both
+    tokenizer = tokenizer_tool()
+    corpus = tokenizer.corpus([doc.text for doc in docs])
+    query_tokens = tokenizer.queries(multiqueries)
 
-    return bm25_all
+    if query_tokens and len(corpus) >= MIN_SHARDED_DOCS:
+        with metrics_tool().span("lexical", count=len(corpus), sharded=True):
+            return sharded_lexical_scores(corpus, query_tokens)
+    return compute_bm25_filtered_scores(docs, multiqueries), compute_jaccard_filtered_scores(multiqueries, [doc.text for doc in docs])
 
 def jaccard_scores(query, candidates):
-    query = remove_stopwords_and_stem(query)
-    candidates = [remove_stopwords_and_stem(c) for c in candidates]
-
-    vect = CountVectorizer(binary=True)
-    all_texts = [query] + candidates
-
-    X = vect.fit_transform(all_texts)
-    qvec = X[0].toarray()[0]
-    scores = []
-
-    for i in range(1, X.shape[0]):
-        dvec = X[i].toarray()[0]
-
-        if np.sum(qvec) == 0 and np.sum(dvec) == 0:
-            scores.append(1.0)
-        else:
-            scores.append(jaccard_score(qvec, dvec))
-    return np.array(scores)
-
-def compute_jaccard_filtered_scores(multiqueries, candidate_texts):
-    jaccard_multi_scores = []
-    
-    for q in multiqueries:
-        scores = jaccard_scores(q, candidate_texts)
-        jaccard_multi_scores.append(scores)
-
-    jaccard_multi_scores = np.array(jaccard_multi_scores)
-    jaccard_all = np.max(jaccard_multi_scores, axis=0)
-
-    return jaccard_all
\ No newline at end of file
+    tokenizer = tokenizer_tool()
+    return JaccardIndex(tokenizer.corpus(candidates)).score(tokenizer.queries([query]))[0]
+
+def compute_jaccard_filtered_scores(multiqueries, candidate_texts, rows=None):
+    tokenizer = tokenizer_tool()
+    corpus = tokenizer.corpus(candidate_texts)
+    query_tokens = tokenizer.queries(multiqueries)
+    sharded = rows is None and len(corpus) >= MIN_SHARDED_DOCS
+
+    with metrics_tool().span("jaccard", count=len(corpus) if rows is None else len(rows), sharded=sharded):
+        if sharded and query_tokens:
+            return sharded_lexical_scores(corpus, query_tokens)[1]
+
+        # Max over multiqueries, intersections for all of them come from one sparse product
+        return jaccard_index_tool(corpus).max_scores(query_tokens, rows)
+
+def group_max(scores, group_sizes):
+    # (sum(group_sizes) x docs) -> (groups x docs), max over each JD's block of multiqueries
+    offsets = np.concatenate([[0], np.cumsum(group_sizes)[:-1]]).astype(np.int64)
+    return np.maximum.reduceat(scores, offsets, axis=0)
+
+def compute_score_matrices(docs, multiquery_groups, embed_model, pool_index=None, query_vectors=None):
+    # One (JDs x candidates) matrix per signal, every JD's multiqueries scored in a single pass per signal.
+    # Callers that already embedded the queries pass query_vectors (unit-normalized, in group order)
+    group_sizes = [len(group) for group in multiquery_groups]
+    all_queries = [q for group in multiquery_groups for q in group]
+
+    tokenizer = tokenizer_tool()
+    corpus = tokenizer.corpus([doc.text_resource.text for doc in docs])
+    query_tokens = tokenizer.queries(all_queries)
+    with metrics_tool().span("bm25", count=len(corpus), queries=len(all_queries)):
+        bm25_matrix = group_max(bm25_index_tool(corpus).score(query_tokens), group_sizes)
+    with metrics_tool().span("jaccard", count=len(corpus), queries=len(all_queries)):
+        jaccard_matrix = group_max(jaccard_index_tool(corpus).score(query_tokens), group_sizes)
+
+    vector_index, doc_rows = pool_index or index_pool(docs, embed_model)
+    if query_vectors is None:
+        query_vectors = embed_queries(all_queries, embed_model)
+    with metrics_tool().span("vector_scores", count=len(doc_rows), queries=len(all_queries)):
+        similarities = query_vectors @ np.asarray(vector_index.vectors[doc_rows]).T
+        node_matrix = group_max(similarities, group_sizes)
+    return bm25_matrix, jaccard_matrix, node_matrix
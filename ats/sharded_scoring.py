@@ -0,0 +1,200 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import numpy as np
+import multiprocessing
+import scipy.sparse as sp
+import concurrent.futures
+from pathlib import Path
+from tools.storage import cache_path_tool
+
+LEXICAL_WORKERS = int(os.getenv("LEXICAL_WORKERS", os.cpu_count() or 1))
+MIN_SHARDED_DOCS = 20_000  # below this, process hand-off costs more than the products
+MIN_SHARD_DOCS = 5_000
+MAX_SAVED_SHARD_SETS = 4
+SHARD_LEASE_SECONDS = 3600  # a set opened or scored this recently is never pruned, service workers may map it
+
+# Arrays of one shard set, all docs-major CSR so a shard is a contiguous row range. Columns index the set's own
+# terms.npy and idf.npy, vocabulary ids are per process and would point at other terms after a restart or in
+# another process, so a set is read without any corpus
+SHARD_ARRAYS = ("bm25_data", "bm25_indices", "bm25_indptr", "jaccard_indices", "jaccard_indptr")
+
+def shard_ranges(num_docs, num_shards):
+    bounds = np.linspace(0, num_docs, num_shards + 1).astype(np.int64)
+    return [(int(s), int(e)) for s, e in zip(bounds[:-1], bounds[1:]) if e > s]
+
+class LexicalShards:
+    # Saturated BM25 term frequencies and Jaccard term sets on disk, workers memory-map them read-only and
+    # score row ranges without pickling the index. Pool-wide IDF rides on the query matrix, so shards agree
+
+    def __init__(self, shard_dir):
+        self.dir = shard_dir
+        self.touch()
+        self.num_docs = len(np.load(shard_dir / "jaccard_indptr.npy", mmap_mode="r")) - 1
+        self.columns = {str(term): i for i, term in enumerate(np.load(shard_dir / "terms.npy"))}
+        self.idf = np.load(shard_dir / "idf.npy")
+
+    @classmethod
+    def build(cls, shard_dir, bm25_index, jaccard_index):
+        bm25_docs = bm25_index.matrix.T.tocsr()
+        used = np.unique(bm25_docs.indices)
+        terms = np.array([bm25_index.vocab.terms[i] for i in used], dtype=str)
+        arrays = {
+            "bm25_data": bm25_docs.data.astype(np.float32),
+            "bm25_indices": np.searchsorted(used, bm25_docs.indices).astype(np.int32),
+            "bm25_indptr": bm25_docs.indptr.astype(np.int64),
+            "jaccard_indices": np.searchsorted(used, jaccard_index.matrix.indices).astype(np.int32),
+            "jaccard_indptr": jaccard_index.matrix.indptr.astype(np.int64),
+            "terms": terms,
+            "idf": bm25_index.idf[used],
+        }
+
+        # Written under a private temp name and renamed, a half-written set is never picked up. Builders of the
+        # same key write identical sets, the first rename wins and the others drop theirs
+        tmp_dir = Path(tempfile.mkdtemp(prefix=".build-", dir=shard_dir.parent))
+        for name, array in arrays.items():
+            np.save(tmp_dir / f"{name}.npy", array)
+        if (shard_dir / "jaccard_indptr.npy").exists() and not (shard_dir / "idf.npy").exists():
+            shutil.rmtree(shard_dir, ignore_errors=True)  # a set from before terms.npy and idf.npy
+        try:
+            os.replace(tmp_dir, shard_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return cls(shard_dir)
+
+    def touch(self):
+        # Lease renewal, prune_shard_sets keeps sets used within SHARD_LEASE_SECONDS
+        try:
+            os.utime(self.dir)
+        except OSError:
+            pass
+
+    def query_matrices(self, query_tokens, jaccard=True):
+        # Same query matrices as BM25Index and JaccardIndex, in the set's own columns.
+        # Jaccard sizes count every distinct query term, including ones the pool never uses
+        rows, cols = [], []
+        sizes = np.zeros(len(query_tokens), dtype=np.float32)
+        for i, tokens in enumerate(query_tokens):
+            terms = set(tokens)
+            ids = [self.columns[t] for t in terms if t in self.columns]
+            sizes[i] = len(terms)
+            rows.extend([i] * len(ids))
+            cols.extend(ids)
+
+        cols = np.asarray(cols, dtype=np.int64)
+        shape = (len(query_tokens), len(self.columns))
+        bm25_query = sp.csr_matrix((self.idf[cols], (rows, cols)), shape=shape)
+        if not jaccard:
+            return bm25_query, None, None
+        return bm25_query, sp.csr_matrix((np.ones(len(cols), dtype=np.float32), (rows, cols)), shape=shape), sizes
+
+    def matrices(self, query_tokens):
+        # (queries x docs) BM25 and Jaccard of the whole pool in this process, for callers that reduce per group
+        self.touch()
+        return score_rows(str(self.dir), 0, self.num_docs, *self.query_matrices(query_tokens))
+
+    def score(self, query_tokens, jaccard=True, workers=LEXICAL_WORKERS):
+        # Max-over-queries BM25 and Jaccard (None unless jaccard) for the whole pool,
+        # one task per shard, merged in pool order
+        self.touch()
+        num_shards = max(1, min(workers, self.num_docs // MIN_SHARD_DOCS))
+        bm25_scores = np.zeros(self.num_docs, dtype=np.float32)
+        jaccard_scores = np.zeros(self.num_docs, dtype=np.float32)
+
+        bm25_query, jaccard_query, jaccard_sizes = self.query_matrices(query_tokens, jaccard)
+        futures = [
+            lexical_pool_tool().submit(score_shard, str(self.dir), start, end, bm25_query, jaccard_query, jaccard_sizes)
+            for start, end in shard_ranges(self.num_docs, num_shards)
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            start, end, bm25_max, jaccard_max = future.result()
+            bm25_scores[start:end] = bm25_max
+            if jaccard_max is not None:
+                jaccard_scores[start:end] = jaccard_max
+        return bm25_scores, (jaccard_scores if jaccard_query is not None else None)
+
+_worker_arrays = {}
+
+def open_shard_arrays(shard_dir):
+    # Memory maps stay open in the worker, the OS page cache is shared by every process
+    if shard_dir not in _worker_arrays:
+        _worker_arrays.clear()
+        _worker_arrays[shard_dir] = {name: np.load(f"{shard_dir}/{name}.npy", mmap_mode="r") for name in SHARD_ARRAYS}
+    return _worker_arrays[shard_dir]
+
+def row_slice(data, indices, indptr, start, end, num_cols):
+    # Zero-copy CSR view of rows [start, end)
+    lo, hi = int(indptr[start]), int(indptr[end])
+    return sp.csr_matrix(
+        (data[lo:hi] if data is not None else np.ones(hi - lo, dtype=np.float32), indices[lo:hi], indptr[start:end + 1] - lo),
+        shape=(end - start, num_cols),
+        copy=False
+    )
+
+def score_rows(shard_dir, start, end, bm25_query, jaccard_query, jaccard_sizes):
+    # (queries x docs) BM25 and Jaccard (None when jaccard_query is None) of rows [start, end)
+    arrays = open_shard_arrays(shard_dir)
+
+    bm25_rows = row_slice(arrays["bm25_data"], arrays["bm25_indices"], arrays["bm25_indptr"], start, end, bm25_query.shape[1])
+    bm25 = np.asarray((bm25_query @ bm25_rows.T).todense())
+    if jaccard_query is None:
+        return bm25, None
+
+    # Same Jaccard as JaccardIndex.score, doc sizes are the row lengths
+    jaccard_rows = row_slice(None, arrays["jaccard_indices"], arrays["jaccard_indptr"], start, end, jaccard_query.shape[1])
+    doc_sizes = np.diff(arrays["jaccard_indptr"][start:end + 1]).astype(np.float32)
+    intersection = np.asarray((jaccard_query @ jaccard_rows.T).todense())
+    union = jaccard_sizes[:, None] + doc_sizes[None, :] - intersection
+    jaccard = np.ones_like(intersection)
+    np.divide(intersection, union, out=jaccard, where=union > 0)
+    return bm25, jaccard
+
+def score_shard(shard_dir, start, end, bm25_query, jaccard_query, jaccard_sizes):
+    bm25, jaccard = score_rows(shard_dir, start, end, bm25_query, jaccard_query, jaccard_sizes)
+    return start, end, bm25.max(axis=0), (jaccard.max(axis=0) if jaccard is not None else None)
+
+_lexical_pool = None
+_shards = {}
+_shards_lock = threading.Lock()
+
+def lexical_pool_tool():
+    # Spawned once, workers only import numpy/scipy and this module
+    global _lexical_pool
+    if _lexical_pool is None:
+        _lexical_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=LEXICAL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _lexical_pool
+
+def lexical_shards_tool(corpus, bm25_index, jaccard_index):
+    # Keyed by content only, the stored term strings make a set usable from any process
+    key = corpus.key
+
+    with _shards_lock:
+        if key not in _shards:
+            shard_dir = cache_path_tool("lexical_shards", key, "idf.npy").parent
+            if (shard_dir / "idf.npy").exists():
+                _shards.clear()
+                _shards[key] = LexicalShards(shard_dir)
+            else:
+                # Sets from before terms.npy and idf.npy carry process-local ids and are rebuilt
+                _shards.clear()
+                _shards[key] = LexicalShards.build(shard_dir, bm25_index, jaccard_index)
+                prune_shard_sets(shard_dir.parent)
+        return _shards[key]
+
+def prune_shard_sets(root, keep=MAX_SAVED_SHARD_SETS, lease=SHARD_LEASE_SECONDS):
+    # Beyond the newest sets, only ones nobody has used within the lease go. Builds in progress are skipped,
+    # ones left behind by a crash expire the same way
+    expired = time.time() - lease
+    saved, builds = [], []
+    for d in root.iterdir():
+        if d.is_dir():
+            (builds if d.name.startswith(".build-") else saved).append(d)
+    saved.sort(key=lambda d: d.stat().st_mtime, reverse=True)
+    for stale in saved[keep:] + builds:
+        if stale.stat().st_mtime < expired:
+            shutil.rmtree(stale, ignore_errors=True)
@@ -0,0 +1,57 @@
+import sqlite3
+import threading
+import numpy as np
+from tools.storage import cache_path_tool
+
+SQLITE_BATCH = 500  # stays under SQLite's bound-parameter limit
+
+class TokenStore:
+    # Stemmed term counts of every candidate text, keyed by content hash, so restarts never re-stem the pool
+
+    def __init__(self, path=None):
+        self.path = str(path or cache_path_tool("tokens.sqlite"))
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tokens (
+                text_hash TEXT PRIMARY KEY,
+                terms TEXT NOT NULL,
+                counts BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, text_hashes):
+        # {text_hash: (terms, counts)} for the hashes that are stored
+        found = {}
+        with self._lock:
+            for i in range(0, len(text_hashes), SQLITE_BATCH):
+                batch = text_hashes[i:i + SQLITE_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, terms, counts FROM tokens WHERE text_hash IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for text_hash, terms, counts in rows:
+                    found[text_hash] = (terms.split(" ") if terms else [], np.frombuffer(counts, dtype=np.int32))
+        return found
+
+    def put_many(self, items):
+        # items: (text_hash, terms, counts)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tokens VALUES (?, ?, ?)",
+                [(text_hash, " ".join(terms), np.asarray(counts, dtype=np.int32).tobytes()) for text_hash, terms, counts in items]
+            )
+            self._conn.commit()
+
+_token_store = None
+
+def token_store_tool():
+    global _token_store
+    if _token_store is None:
+        _token_store = TokenStore()
+    return _token_store
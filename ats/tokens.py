@@ -0,0 +1,162 @@
+import re
+import nltk
+import string
+import Stemmer
+import threading
+import numpy as np
+from collections import OrderedDict, Counter
+from nltk.corpus import stopwords
+from tools.storage import sha256_text
+from tools.metrics import metrics_tool
+from ats.token_store import token_store_tool
+
+nltk.download('stopwords')
+stemmer = Stemmer.Stemmer("english")
+STOPWORDS = set(stopwords.words('english'))
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")  # bm25s / CountVectorizer default token pattern
+MAX_CACHED_DOCS = 200_000
+
+_stemmer_lock = threading.Lock()
+
+def remove_stopwords_and_stem(text):
+    text = text.lower()
+    text = text.translate(PUNCTUATION_TABLE)
+    tokens = text.split()
+    tokens = [t for t in tokens if t not in STOPWORDS]
+    with _stemmer_lock:  # PyStemmer objects are not thread-safe
+        stems = stemmer.stemWords(tokens)
+    return ' '.join(stems)
+
+def stem_tokens(text):
+    # Same terms both lexical scorers saw when they re-tokenized the stemmed string
+    return TOKEN_PATTERN.findall(remove_stopwords_and_stem(text))
+
+class Vocabulary:
+    # Interned term strings, ids are stable for the life of the process
+
+    def __init__(self):
+        self.ids = {}
+        self.terms = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.terms)
+
+    def intern(self, terms):
+        with self._lock:
+            ids = np.empty(len(terms), dtype=np.int32)
+            for i, term in enumerate(terms):
+                term_id = self.ids.get(term)
+                if term_id is None:
+                    term_id = self.ids[term] = len(self.terms)
+                    self.terms.append(term)
+                ids[i] = term_id
+        return ids
+
+class TokenCorpus:
+    # Per-document postings (sorted distinct term ids + counts) concatenated, CSR-style offsets per document
+
+    def __init__(self, vocab, hashes, postings):
+        self.vocab = vocab
+        self.hashes = hashes
+        self.key = sha256_text("\n".join(hashes))
+        self.offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum([len(ids) for ids, _ in postings], out=self.offsets[1:])
+        self.ids = np.concatenate([ids for ids, _ in postings]) if postings else np.zeros(0, dtype=np.int32)
+        self.counts = np.concatenate([counts for _, counts in postings]) if postings else np.zeros(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def doc(self, i):
+        return self.ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def doc_sizes(self):
+        # Distinct terms per document
+        return np.diff(self.offsets)
+
+    def doc_lengths(self):
+        # Tokens per document, repeats included
+        cumulative = np.concatenate([[0], np.cumsum(self.counts, dtype=np.int64)])
+        return cumulative[self.offsets[1:]] - cumulative[self.offsets[:-1]]
+
+def count_terms(tokens):
+    counts = Counter(tokens)
+    return list(counts.keys()), np.fromiter(counts.values(), dtype=np.int32, count=len(counts))
+
+class CorpusTokenizer:
+    # Tokenizes and stems each distinct candidate text once, keyed by content hash.
+    # Memory first, then the persistent token store, only never-seen texts are stemmed
+
+    def __init__(self, max_cached_docs=MAX_CACHED_DOCS, store=None):
+        self.vocab = Vocabulary()
+        self.max_cached_docs = max_cached_docs
+        self.store = store
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def postings(self, terms, counts):
+        ids = self.vocab.intern(terms)
+        order = np.argsort(ids)
+        return ids[order], np.asarray(counts, dtype=np.int32)[order]
+
+    def tokenize(self, text, text_hash=None):
+        return self.tokenize_many([text], [text_hash or sha256_text(text)])[0]
+
+    def tokenize_many(self, texts, hashes):
+        results = [None] * len(texts)
+        missing = {}
+
+        with self._lock:
+            for i, text_hash in enumerate(hashes):
+                postings = self._cache.get(text_hash)
+                if postings is not None:
+                    self._cache.move_to_end(text_hash)
+                    results[i] = postings
+                else:
+                    missing.setdefault(text_hash, []).append(i)
+
+        if not missing:
+            return results
+
+        # Only memory-cache misses are timed, stemming is what this stage is about
+        with metrics_tool().span("tokenize", count=len(missing)) as span:
+            store = self.store or token_store_tool()
+            stored = store.get_many(list(missing))
+            new_items = []
+            fresh = {}
+
+            for text_hash, positions in missing.items():
+                if text_hash in stored:
+                    terms, counts = stored[text_hash]
+                else:
+                    terms, counts = count_terms(stem_tokens(texts[positions[0]]))
+                    new_items.append((text_hash, terms, counts))
+
+                postings = fresh[text_hash] = self.postings(terms, counts)
+                for i in positions:
+                    results[i] = postings
+
+            if new_items:
+                store.put_many(new_items)
+            span["stemmed"] = len(new_items)
+
+        with self._lock:
+            self._cache.update(fresh)
+            while len(self._cache) > self.max_cached_docs:
+                self._cache.popitem(last=False)
+        return results
+
+    def corpus(self, texts):
+        hashes = [sha256_text(t) for t in texts]
+        return TokenCorpus(self.vocab, hashes, self.tokenize_many(texts, hashes))
+
+    def queries(self, texts):
+        # Queries are few and JD-specific, so they are stemmed fresh and kept as term strings
+        return [stem_tokens(t) for t in texts]
+
+_tokenizer = CorpusTokenizer()
+
+def tokenizer_tool():
+    return _tokenizer
@@ -0,0 +1,186 @@
+import os
+import re
+import hashlib
+import threading
+import numpy as np
+from tools.storage import cache_path_tool
+
+KEY_BYTES = 32
+MIN_TRAIN_SIZE = 2048  # below this brute force is as fast as probing
+RETRAIN_GROWTH = 4
+KMEANS_ITERATIONS = 10
+DEFAULT_NPROBE = 8
+
+def unit_normalize(x):
+    return x / (np.linalg.norm(x, axis=-1, keepdims=True) + 1e-8)
+
+def spherical_kmeans(vectors, nlist, iterations=KMEANS_ITERATIONS, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = vectors[assignments == c]
+            # Empty clusters are re-seeded from a random vector
+            centroids[c] = members.sum(axis=0) if len(members) else vectors[rng.integers(len(vectors))]
+        centroids = unit_normalize(centroids)
+    return centroids.astype(np.float32)
+
+class VectorIndex:
+    # IVF index over unit-normalized candidate embeddings, exact brute force until the pool is big enough
+
+    def __init__(self, model_name, root=None):
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+        self.dir = root or cache_path_tool("vector_index", safe_name, "vectors.f32").parent
+        self.vectors_path = self.dir / "vectors.f32"
+        self.keys_path = self.dir / "keys.bin"
+        self.ivf_path = self.dir / "ivf.npz"
+        self.dim_path = self.dir / "dim"
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        keys = self.keys_path.read_bytes() if self.keys_path.exists() else b""
+        vector_bytes = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        self.dim = int(self.dim_path.read_text()) if self.dim_path.exists() else 0
+
+        # Same crash rule as the embedding store: only rows present in both files count
+        self.count = min(len(keys) // KEY_BYTES, vector_bytes // (4 * self.dim)) if self.dim else 0
+        self.index = {keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]: i for i in range(self.count)}
+        self.vectors = None
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.trained_size = 0
+
+        if self.count:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+
+        if self.ivf_path.exists():
+            ivf = np.load(self.ivf_path)
+            self.centroids = ivf["centroids"]
+            self.assignments = ivf["assignments"][:self.count]
+            self.trained_size = int(ivf["trained_size"])
+            if len(self.assignments) < self.count:
+                self._assign_tail()
+        self._build_lists()
+
+    def save(self):
+        # Written whole and renamed, service workers may be loading the previous file
+        if self.centroids is not None:
+            tmp_path = self.ivf_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.savez(f, centroids=self.centroids, assignments=self.assignments, trained_size=self.trained_size)
+            os.replace(tmp_path, self.ivf_path)
+
+    def _assign_tail(self):
+        # Incremental insert: new vectors join the list of their nearest centroid
+        tail = np.asarray(self.vectors[len(self.assignments):])
+        tail_assignments = np.argmax(tail @ self.centroids.T, axis=1).astype(np.int32)
+        self.assignments = np.concatenate([self.assignments, tail_assignments])
+
+    def _build_lists(self):
+        # Inverted lists as one array of rows sorted by list, plus per-list offsets
+        if self.centroids is None:
+            self.list_rows, self.list_offsets = None, None
+            return
+        self.list_rows = np.argsort(self.assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def train(self):
+        nlist = int(np.clip(2 * np.sqrt(self.count), 16, 4096))
+        sample_size = min(self.count, 64 * nlist)
+        sample_rows = np.sort(np.random.default_rng(0).choice(self.count, sample_size, replace=False))
+
+        self.centroids = spherical_kmeans(np.asarray(self.vectors[sample_rows]), nlist)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self._assign_tail()
+        self.trained_size = self.count
+
+    def add(self, keys, vectors):
+        vectors = np.ascontiguousarray(unit_normalize(np.asarray(vectors, dtype=np.float32)))
+        if not self.dim:
+            self.dim = vectors.shape[1]
+            self.dim_path.write_text(str(self.dim))
+
+        with open(self.vectors_path, "ab") as f:
+            f.seek(self.count * self.dim * 4)
+            f.truncate()
+            f.write(vectors.tobytes())
+        with open(self.keys_path, "ab") as f:
+            f.seek(self.count * KEY_BYTES)
+            f.truncate()
+            f.write(b"".join(keys))
+
+        for offset, key in enumerate(keys):
+            self.index[key] = self.count + offset
+        self.count += len(keys)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+
+        # Lists are retrained once the pool has grown well past what the centroids were fitted on
+        if self.count >= MIN_TRAIN_SIZE and (self.centroids is None or self.count > RETRAIN_GROWTH * self.trained_size):
+            self.train()
+        elif self.centroids is not None:
+            self._assign_tail()
+        self._build_lists()
+        self.save()
+
+    def ensure(self, texts, embed_fn):
+        # Row of every text in the index, embedding and inserting only the ones not indexed yet
+        keys = [hashlib.sha256(text.encode("utf-8")).digest() for text in texts]
+
+        with self._lock:
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in self.index and key not in missing:
+                    missing[key] = text
+
+            if missing:
+                self.add(list(missing.keys()), embed_fn(list(missing.values())))
+            return np.fromiter((self.index[key] for key in keys), dtype=np.int64, count=len(keys))
+
+    def rows(self, texts):
+        # Read-only lookup for processes that must not write the index, KeyError for a text never indexed
+        keys = [hashlib.sha256(text.encode("utf-8")).digest() for text in texts]
+        return np.fromiter((self.index[key] for key in keys), dtype=np.int64, count=len(keys))
+
+    def similarity(self, query_vectors, rows):
+        # Exact max-over-queries cosine similarity for the given rows
+        if not len(rows):
+            return np.zeros(0, dtype=np.float32)
+        return (np.asarray(self.vectors[rows]) @ query_vectors.T).max(axis=1)
+
+    def search(self, query_vectors, k, rows, nprobe=DEFAULT_NPROBE):
+        # Top-k positions into rows by max-over-queries similarity, probing only the nearest lists
+        if k >= len(rows) or self.centroids is None:
+            candidates = np.arange(len(rows))
+        else:
+            position = np.full(self.count, -1, dtype=np.int64)
+            position[rows] = np.arange(len(rows))
+            centroid_scores = query_vectors @ self.centroids.T
+
+            # Widen the probe until the lists hold at least k of the requested rows
+            while True:
+                probed = np.unique(np.argsort(-centroid_scores, axis=1)[:, :nprobe])
+                probed_rows = np.concatenate([self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probed])
+                candidates = position[probed_rows]
+                candidates = candidates[candidates >= 0]
+                if len(candidates) >= k or nprobe >= len(self.centroids):
+                    break
+                nprobe *= 2
+
+        scores = self.similarity(query_vectors, rows[candidates])
+        if k < len(candidates):
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        return candidates, scores
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def vector_index_tool(model_name):
+    with _indexes_lock:
+        if model_name not in _indexes:
+            _indexes[model_name] = VectorIndex(model_name)
+        return _indexes[model_name]
@@ -0,0 +1,149 @@
+# Local stand-in for the OpenAI endpoints the app calls, runs as its own process so it never shows up in
+# the benchmark's timings or RSS:
+#   python -m bench.fake_openai --port 8765 --latency 0.3 --jitter 0.1 --rate-429 0.05
+# Resume parsing and JD multiquery tool calls get synthetic arguments, embeddings are hashed bags of words
+import re
+import sys
+import json
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+import numpy as np
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from bench.synthetic import synthetic_tool_args, jd_variants
+
+TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self._send(200, self.server.counts)
+        else:
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        endpoint = "chat" if self.path.endswith("/chat/completions") else "embeddings" if self.path.endswith("/embeddings") else None
+        if endpoint is None:
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        time.sleep(max(0.0, random.gauss(server.latency, server.jitter)))
+        with server.lock:
+            server.counts[endpoint] += 1
+            limited = random.random() < server.rate_429
+            server.counts["rate_limited"] += limited
+        if limited:
+            self._send(429, {"error": {"message": "Rate limit reached (benchmark)", "type": "requests",
+                                       "code": "rate_limit_exceeded"}},
+                       {"retry-after": str(server.retry_after)})
+            return
+
+        self._send(200, self.chat(request) if endpoint == "chat" else self.embeddings(request))
+
+    def chat(self, request):
+        name = request["tool_choice"]["function"]["name"]
+        content = json.dumps(request["messages"])
+        rng = random.Random(hashlib.sha256(content.encode("utf-8")).hexdigest())
+
+        if name == "generate_jd_variants":
+            jd = request["messages"][-1]["content"].strip().split("\n")[-1]
+            arguments = {"original_jd": jd, "variant_jds": jd_variants(jd, 4, rng)}
+        else:
+            arguments = synthetic_tool_args(rng)
+        arguments = json.dumps(arguments)
+
+        prompt_tokens, completion_tokens = len(content) // 4, len(arguments) // 4
+        return {
+            "id": f"chatcmpl-bench-{rng.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": None, "tool_calls": [
+                    {"id": "call_0", "type": "function", "function": {"name": name, "arguments": arguments}}
+                ]},
+                "finish_reason": "tool_calls",
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def embeddings(self, request):
+        texts = request["input"] if isinstance(request["input"], list) else [request["input"]]
+        dim = request.get("dimensions") or self.server.dim
+        data = []
+        for i, text in enumerate(texts):
+            vector = self.server.embed(text, dim)
+            # The SDK asks for base64 by default, it is also far smaller than JSON floats
+            embedding = base64.b64encode(vector.tobytes()).decode() if request.get("encoding_format") == "base64" else vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+        tokens = sum(len(text) // 4 for text in texts if isinstance(text, str))
+        return {"object": "list", "data": data, "model": request["model"],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.2, jitter=0.05, rate_429=0.0, retry_after=0, dim=256):
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency, self.jitter, self.rate_429, self.retry_after, self.dim = latency, jitter, rate_429, retry_after, dim
+        self.lock = threading.Lock()
+        self.counts = {"chat": 0, "embeddings": 0, "rate_limited": 0}
+        self._token_dims = {}
+
+    def embed(self, text, dim):
+        # Signed hashed bag of words, texts sharing vocabulary land close together like real embeddings
+        vector = np.zeros(dim, dtype=np.float32)
+        for token in TOKEN_RE.findall(text.lower()):
+            slot = self._token_dims.get(token)
+            if slot is None:
+                h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+                slot = self._token_dims[token] = (h % 65536, 1.0 if (h >> 32) & 1 else -1.0)
+            vector[slot[0] % dim] += slot[1]
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).astype("<f4")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI chat-completions and embeddings API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Mean seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Standard deviation of the latency")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=0, help="retry-after header on 429 responses, seconds")
+    parser.add_argument("--dim", type=int, default=256, help="Embedding dimension")
+    args = parser.parse_args(argv)
+
+    server = FakeOpenAIServer((args.host, args.port), args.latency, args.jitter, args.rate_429, args.retry_after, args.dim)
+    print(f"Fake OpenAI API on http://{args.host}:{args.port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    sys.exit(main())
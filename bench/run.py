@@ -0,0 +1,251 @@
+# End-to-end benchmark against the local fake OpenAI server, nothing leaves the machine:
+#   python -m bench.run                                        parse 200 PDFs, rank pools of 1k/10k/100k
+#   python -m bench.run --pools 1000,10000 --rate-429 0.05 --out bench.json
+#   python -m bench.run --baseline bench.json                  exit 1 when a stage regressed past --tolerance
+# Every stage reports count, wall time, throughput, p50/p95 latency and this process's peak RSS
+import os
+import gc
+import sys
+import json
+import time
+import socket
+import shutil
+import resource
+import argparse
+import subprocess
+import urllib.request
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+STAGE_METRICS = {"p95_ms": "higher", "seconds": "higher", "peak_rss_mb": "higher", "throughput_per_s": "lower"}
+
+def reset_peak_rss():
+    # Linux lets a process reset its own high-water mark, elsewhere the peak is since process start
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class Stage:
+    # Times one stage, per-item latencies go through sample() and end up as p50/p95
+    def __init__(self, results, name, pool=None):
+        self.results, self.name, self.pool = results, name, pool
+        self.samples = []
+        self.count = 0
+        self.extra = {}
+
+    def __enter__(self):
+        gc.collect()
+        reset_peak_rss()
+        self.start = time.perf_counter()
+        return self
+
+    def sample(self, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.samples.append(time.perf_counter() - start)
+        self.count += 1
+        return result
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        record = {"stage": self.name, "pool": self.pool, "count": self.count, "seconds": round(seconds, 4),
+                  "throughput_per_s": round(self.count / seconds, 2) if seconds and self.count else None,
+                  "peak_rss_mb": round(peak_rss_mb(), 1)}
+        if self.samples:
+            samples_ms = np.array(self.samples) * 1000
+            record.update({"p50_ms": round(float(np.percentile(samples_ms, 50)), 2),
+                           "p95_ms": round(float(np.percentile(samples_ms, 95)), 2),
+                           "first_ms": round(float(samples_ms[0]), 2)})
+        record.update(self.extra)
+        self.results.append(record)
+        print(format_record(record), flush=True)
+
+def format_record(record):
+    stage = record["stage"] + (f"@{record['pool']}" if record["pool"] else "")
+    cells = [f"{stage:<32}", f"n={record['count']:<7}", f"{record['seconds']:>9.2f}s"]
+    cells.append(f"{record['throughput_per_s']:>10.1f}/s" if record["throughput_per_s"] else " " * 12)
+    cells.append(f"p50 {record['p50_ms']:>9.1f}ms  p95 {record['p95_ms']:>9.1f}ms" if "p50_ms" in record else " " * 32)
+    cells.append(f"peak {record['peak_rss_mb']:>8.1f}MB")
+    return "  ".join(cells)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_fake_server(args):
+    port = free_port()
+    process = subprocess.Popen([
+        sys.executable, "-m", "bench.fake_openai", "--port", str(port), "--latency", str(args.latency),
+        "--jitter", str(args.jitter), "--rate-429", str(args.rate_429), "--dim", str(args.dim),
+    ])
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process, f"http://127.0.0.1:{port}/v1"
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Fake OpenAI server did not start")
+
+def server_counts(base_url):
+    with urllib.request.urlopen(f"{base_url}/stats", timeout=5) as response:
+        return json.load(response)
+
+def bench_parsing(results, args, workdir):
+    from bench.synthetic import write_resume_pdfs
+    from tools.time import time_tool
+    from tools.model import client_tool
+    from parsing.extraction_engine import ExtractionEngine
+    from parsing.resume_processing import resume_extract_info, resume_text_2_json
+
+    pdfs = write_resume_pdfs(workdir / "resumes", args.resumes, args.scanned_fraction, args.seed)
+    scanned = sum(Path(p).name.startswith("scanned") for p in pdfs)
+    print(f"Generated {len(pdfs)} resume PDFs ({scanned} scanned)", flush=True)
+
+    with Stage(results, "resume_extract_info") as stage:
+        infos = [stage.sample(resume_extract_info, p) for p in pdfs]
+
+    # Plain sequential calls through the SDK, its own retries absorb the 429s
+    client, current_month_year = client_tool(), time_tool()
+    with Stage(results, "resume_text_2_json") as stage:
+        for info in infos[:args.llm_samples]:
+            stage.sample(resume_text_2_json, info, current_month_year, client)
+
+    # The production path: extraction processes feeding rate-limited async LLM calls, cold parse cache
+    engine = ExtractionEngine(current_month_year)
+    with Stage(results, "parse_pipeline") as stage:
+        errors = []
+        rows = engine.run(pdfs, on_error=lambda filepath, error: errors.append(str(error)))
+        stage.count = len(rows)
+        stage.extra = {"failed": len(errors), "retries": engine.retries, "rate_limited": engine.rate_limited}
+
+def bench_ranking(results, args, pool_size):
+    from bench.synthetic import synthetic_rows, synthetic_jds
+    from ats.schema import jd_schema
+    from ats.tokens import tokenizer_tool
+    from ats.helper import build_documents, generate_multiqueries
+    from ats.ranking import score_jd, rerank_components, fuse_scores
+    from ats.scorer import index_pool, compute_bm25_filtered_scores, compute_jaccard_filtered_scores, compute_node_scores
+    from tools.model import client_tool, embed_model_tool
+
+    docs = build_documents(pd.DataFrame(synthetic_rows(pool_size, args.seed)))
+    texts = [doc.text_resource.text for doc in docs]
+    jds = synthetic_jds(args.queries, args.seed + pool_size)
+    client, job_schema, embed_model = client_tool(), jd_schema(), embed_model_tool()
+
+    with Stage(results, "multiqueries", pool_size) as stage:
+        groups = [stage.sample(generate_multiqueries, client, job_schema, jd, 4) for jd in jds]
+
+    with Stage(results, "embeddings", pool_size) as stage:
+        pool_index = index_pool(docs, embed_model)
+        stage.count = len(docs)
+
+    with Stage(results, "tokenize", pool_size) as stage:
+        tokenizer_tool().corpus(texts)
+        stage.count = len(docs)
+
+    # Full-pool signals per JD, the first sample includes building the index
+    with Stage(results, "bm25", pool_size) as stage:
+        bm25 = [stage.sample(compute_bm25_filtered_scores, docs, mq) for mq in groups]
+    with Stage(results, "jaccard", pool_size) as stage:
+        jaccard = [stage.sample(compute_jaccard_filtered_scores, mq, texts) for mq in groups]
+    with Stage(results, "vector_scores", pool_size) as stage:
+        node = [stage.sample(compute_node_scores, docs, mq, embed_model, None, pool_index) for mq in groups]
+    with Stage(results, "fusion", pool_size) as stage:
+        for b, j, n in zip(bm25, jaccard, node):
+            stage.sample(fuse_scores, b, j, n)
+    del bm25, jaccard, node
+
+    # What a user waits for: the UI's ranking path with warm multiquery and embedding caches
+    with Stage(results, "ranking", pool_size) as stage:
+        for jd in jds:
+            stage.sample(lambda: rerank_components(score_jd(docs, jd, client, job_schema, embed_model)[0]))
+
+def compare(results, baseline, tolerance):
+    # Stages slower, bigger or lower-throughput than the baseline by more than the tolerance
+    previous = {(r["stage"], r["pool"]): r for r in baseline["stages"]}
+    regressions = []
+    for record in results:
+        old = previous.get((record["stage"], record["pool"]))
+        for metric, worse in STAGE_METRICS.items():
+            if not old or not old.get(metric) or not record.get(metric):
+                continue
+            ratio = record[metric] / old[metric]
+            if (ratio > 1 + tolerance) if worse == "higher" else (ratio < 1 - tolerance):
+                regressions.append(f"{record['stage']}@{record['pool']} {metric}: {old[metric]} -> {record[metric]}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end parse and ranking benchmark against a local fake OpenAI API")
+    parser.add_argument("--resumes", type=int, default=200, help="Synthetic resume PDFs to parse")
+    parser.add_argument("--scanned-fraction", type=float, default=0.2)
+    parser.add_argument("--llm-samples", type=int, default=50, help="Sequential resume_text_2_json calls to time")
+    parser.add_argument("--pools", default="1000,10000,100000", help="Comma-separated parsed pool sizes to rank")
+    parser.add_argument("--queries", type=int, default=20, help="Job descriptions ranked per pool")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake API mean latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of fake API requests answered with 429")
+    parser.add_argument("--dim", type=int, default=256, help="Fake embedding dimension")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-parse", action="store_true")
+    parser.add_argument("--workdir", default=".bench", help="Scratch directory, its cache is wiped on every run")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression per metric")
+    args = parser.parse_args(argv)
+
+    workdir = Path(args.workdir)
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir(parents=True)
+    process, base_url = start_fake_server(args)
+
+    # Project modules read cache paths, endpoints and rate limits from the environment at import time
+    os.environ.update({
+        "RESUME_CACHE_DIR": str(workdir / "cache"),
+        "OPENAI_BASE_URL": base_url,
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_RPM": os.environ.get("OPENAI_RPM", "100000"),
+        "OPENAI_TPM": os.environ.get("OPENAI_TPM", "100000000"),
+    })
+
+    results = []
+    try:
+        if not args.skip_parse:
+            bench_parsing(results, args, workdir)
+        for pool_size in (int(p) for p in args.pools.split(",") if p):
+            bench_ranking(results, args, pool_size)
+            gc.collect()
+        counts = server_counts(base_url)
+    finally:
+        process.terminate()
+        process.wait()
+
+    report = {"config": vars(args), "fake_api": counts, "created": time.time(), "stages": results}
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    print(f"Fake API: {counts['chat']} chat, {counts['embeddings']} embedding requests, {counts['rate_limited']} answered 429")
+    print(f"Results -> {args.out}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
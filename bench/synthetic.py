@@ -0,0 +1,167 @@
+import random
+import fitz
+from pathlib import Path
+from parsing.resume_formatting import resume_json_2_row
+
+FIRST_NAMES = ["Aarav", "Maya", "Liam", "Priya", "Noah", "Sofia", "Arjun", "Emma", "Kenji", "Zara", "Diego", "Amara",
+               "Lucas", "Ines", "Ravi", "Hana", "Omar", "Elena", "Tariq", "Mei"]
+LAST_NAMES = ["Sharma", "Nguyen", "Garcia", "Okafor", "Kowalski", "Tanaka", "Silva", "Haddad", "Müller", "Iyer",
+              "Johnson", "Rossi", "Kim", "Petrov", "Mensah", "Costa", "Ahmed", "Larsen", "Chen", "Patel"]
+ROLES = ["Data Analyst", "Data Scientist", "Machine Learning Engineer", "Backend Engineer", "Frontend Engineer",
+         "DevOps Engineer", "Cloud Architect", "Product Analyst", "QA Engineer", "Site Reliability Engineer",
+         "Full Stack Developer", "Security Engineer", "Mobile Developer", "Data Engineer", "NLP Engineer"]
+ORGANIZATIONS = ["Acme Corp", "Globex", "Initech", "Umbrella Labs", "Stark Industries", "Wayne Analytics", "Hooli",
+                 "Vandelay Imports", "Soylent Systems", "Cyberdyne", "Tyrell Data", "Wonka Retail", "Oscorp Cloud"]
+INSTITUTIONS = ["IIT Bombay", "University of Toronto", "TU Munich", "National University of Singapore", "MIT",
+                "University of Lagos", "Universidad de Chile", "Seoul National University", "ETH Zurich"]
+DEGREES = ["B.Tech Computer Science", "B.Sc Statistics", "M.Sc Data Science", "M.Tech Machine Learning",
+           "B.E. Information Technology", "MBA Business Analytics", "Ph.D. Computer Science"]
+CITIES = ["Bengaluru", "Toronto", "Berlin", "Singapore", "Boston", "Lagos", "Santiago", "Seoul", "Zurich", "London"]
+SKILLS = {  # keys are the resume schema's skill categories
+    "languages": ["Python", "Java", "Go", "TypeScript", "SQL", "Scala", "Rust", "C++", "Kotlin", "R"],
+    "frameworks": ["Django", "FastAPI", "React", "Spring Boot", "PyTorch", "TensorFlow", "Spark", "Flask", "Next.js"],
+    "databases": ["PostgreSQL", "MySQL", "MongoDB", "Redis", "Cassandra", "BigQuery", "Snowflake", "Elasticsearch"],
+    "tools": ["Docker", "Kubernetes", "Terraform", "Airflow", "Git", "Jenkins", "Grafana", "Prometheus", "Tableau"],
+    "libraries": ["pandas", "NumPy", "scikit-learn", "Hugging Face Transformers", "spaCy", "XGBoost", "Matplotlib"],
+    "cloud_platforms": ["AWS", "GCP", "Azure"],
+    "soft_skills": ["Communication", "Mentoring", "Stakeholder management", "Problem solving", "Ownership"],
+    "domain_expertise": ["Fintech", "E-commerce", "Healthcare", "Recommendation systems", "Fraud detection", "Logistics"],
+}
+ACTIONS = ["Built", "Designed", "Migrated", "Optimized", "Automated", "Led", "Scaled", "Deployed", "Refactored", "Monitored"]
+OBJECTS = ["data pipelines", "REST APIs", "ML models", "dashboards", "microservices", "ETL jobs", "CI/CD pipelines",
+           "feature stores", "search ranking", "streaming consumers", "A/B testing framework", "batch inference jobs"]
+OUTCOMES = ["cutting latency by {n}%", "saving {n}k USD per year", "serving {n}M daily requests",
+            "improving accuracy by {n}%", "reducing cloud cost by {n}%", "for {n} internal teams"]
+
+def pick(rng, items, k):
+    return rng.sample(items, min(k, len(items)))
+
+def bullet(rng, skills):
+    outcome = rng.choice(OUTCOMES).format(n=rng.randint(2, 60))
+    return f"{rng.choice(ACTIONS)} {rng.choice(OBJECTS)} with {rng.choice(skills)}, {outcome}"
+
+def synthetic_tool_args(rng):
+    # One parsed resume in the shape of the extract_resume_info tool call
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    handle = name.lower().replace(" ", ".")
+    role = rng.choice(ROLES)
+    skills = {category: pick(rng, items, rng.randint(1, 4)) for category, items in SKILLS.items()}
+    flat_skills = [s for items in skills.values() for s in items]
+    start_year = rng.randint(2008, 2022)
+
+    experience = []
+    for i in range(rng.randint(1, 4)):
+        year = start_year + 2 * i
+        experience.append({
+            "role": rng.choice(ROLES), "organization": rng.choice(ORGANIZATIONS), "location": rng.choice(CITIES),
+            "start_date": f"{year}-{rng.randint(1, 12):02d}", "end_date": f"{year + 2}-{rng.randint(1, 12):02d}",
+            "responsibilities": [bullet(rng, flat_skills) for _ in range(rng.randint(2, 5))],
+        })
+
+    return {
+        "candidate_name": name,
+        "candidate_email": f"{handle}@example.com",
+        "candidate_phone": f"+1-555-{rng.randint(1000000, 9999999)}",
+        "job_title": role,
+        "years_of_experience": f"{rng.randint(0, 15)} years",
+        "online_profiles": {"linkedin": f"https://linkedin.com/in/{handle}", "github": f"https://github.com/{handle}",
+                            "portfolio": None, "others": []},
+        "education": [{
+            "degree": rng.choice(DEGREES), "institution": rng.choice(INSTITUTIONS), "location": rng.choice(CITIES),
+            "gpa": f"{rng.uniform(6, 10):.1f}", "start_date": f"{start_year - 4}-08", "end_date": f"{start_year}-05",
+        }],
+        "experience": experience,
+        "projects": [
+            {"title": f"{rng.choice(ACTIONS)} {rng.choice(OBJECTS)}", "organization": rng.choice(ORGANIZATIONS + [""]),
+             "description": bullet(rng, flat_skills)}
+            for _ in range(rng.randint(0, 3))
+        ],
+        "certificates": pick(rng, ["AWS Solutions Architect", "CKA", "GCP Data Engineer", "Azure Fundamentals",
+                                   "Databricks Associate", "PMP"], rng.randint(0, 2)),
+        "awards": pick(rng, ["Hackathon winner", "Employee of the quarter", "Dean's list", "Best paper award"],
+                       rng.randint(0, 2)),
+        "publications": [],
+        "skills": skills,
+    }
+
+def tool_args_text(tool_args):
+    # Plain resume text for the PDF generator
+    lines = [tool_args["candidate_name"], f"{tool_args['candidate_email']} | {tool_args['candidate_phone']}", "",
+             tool_args["job_title"], "", "EXPERIENCE"]
+    for exp in tool_args["experience"]:
+        lines.append(f"{exp['role']}, {exp['organization']} ({exp['start_date']} - {exp['end_date']})")
+        lines.extend(f"- {r}" for r in exp["responsibilities"])
+    lines += ["", "EDUCATION"]
+    lines += [f"{e['degree']}, {e['institution']} ({e['start_date']} - {e['end_date']}), GPA {e['gpa']}" for e in tool_args["education"]]
+    if tool_args["projects"]:
+        lines += ["", "PROJECTS"] + [f"{p['title']}: {p['description']}" for p in tool_args["projects"]]
+    lines += ["", "SKILLS"] + [f"{category.replace('_', ' ').title()}: {', '.join(items)}" for category, items in tool_args["skills"].items()]
+    if tool_args["certificates"]:
+        lines += ["", "CERTIFICATES", ", ".join(tool_args["certificates"])]
+    return "\n".join(lines)
+
+def synthetic_rows(n, seed=0):
+    # Parsed pool rows exactly as the parser stores them, without any PDF or LLM work
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        row = dict(resume_json_2_row(synthetic_tool_args(rng)))
+        row["resume_path"] = f"bench_{i:06d}.pdf"
+        rows.append(row)
+    return rows
+
+def synthetic_jd(rng):
+    role = rng.choice(ROLES)
+    skills = pick(rng, [s for items in SKILLS.values() for s in items], 8)
+    duties = "; ".join(f"{rng.choice(ACTIONS).lower()} {rng.choice(OBJECTS)}" for _ in range(4))
+    return (f"We are hiring a {role} with {rng.randint(1, 8)}+ years of experience. "
+            f"Responsibilities: {duties}. Required skills: {', '.join(skills[:5])}. "
+            f"Nice to have: {', '.join(skills[5:])}. Domain: {rng.choice(SKILLS['domain_expertise'])}.")
+
+def synthetic_jds(n, seed=0):
+    rng = random.Random(seed)
+    return [synthetic_jd(rng) for _ in range(n)]
+
+def jd_variants(jd, n, rng):
+    # Reworded variants: sentences shuffled and a few words dropped, enough to move lexical scores
+    sentences = [s.strip() for s in jd.split(".") if s.strip()]
+    variants = []
+    for _ in range(n):
+        shuffled = rng.sample(sentences, len(sentences))
+        words = [w for w in ". ".join(shuffled).split() if rng.random() > 0.1]
+        variants.append(" ".join(words) + ".")
+    return variants
+
+PAGE_LINES = 60
+
+def write_resume_pdfs(out_dir, n, scanned_fraction=0.2, seed=0):
+    # Text PDFs carry a text layer and a link, scanned ones are the same pages rasterized to JPEG images
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+
+    for i in range(n):
+        tool_args = synthetic_tool_args(rng)
+        lines = tool_args_text(tool_args).split("\n")
+        doc = fitz.open()
+        for start in range(0, len(lines), PAGE_LINES):
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(50, 50, 545, 792), "\n".join(lines[start:start + PAGE_LINES]), fontsize=9)
+        doc[0].insert_link({"kind": fitz.LINK_URI, "from": fitz.Rect(50, 50, 300, 62),
+                            "uri": tool_args["online_profiles"]["linkedin"]})
+
+        scanned = rng.random() < scanned_fraction
+        if scanned:
+            scan = fitz.open()
+            for page in doc:
+                jpeg = page.get_pixmap(dpi=110, colorspace=fitz.csGRAY).tobytes("jpeg", jpg_quality=70)
+                scan.new_page(width=page.rect.width, height=page.rect.height).insert_image(page.rect, stream=jpeg)
+            doc.close()
+            doc = scan
+
+        path = out_dir / f"{'scanned' if scanned else 'text'}_{i:05d}.pdf"
+        doc.save(path)
+        doc.close()
+        paths.append(str(path))
+    return paths
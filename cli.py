@@ -0,0 +1,115 @@
+# Headless entry point, same code paths as the Streamlit app:
+#   python cli.py ingest resumes/ batch.zip           parse PDFs, directories and zips into the candidate pool
+#   python cli.py resume                              finish jobs interrupted by a crash or restart
+#   python cli.py rank jd.txt [jd2.txt ...] --out ranked.csv
+#   python cli.py metrics [--run job-<id>]                 Prometheus text, or one run's per-stage breakdown
+import sys
+import argparse
+import pandas as pd
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Before the project imports, cache paths and rate limits are read from the environment at import time
+load_dotenv()
+
+from ats.schema import jd_schema
+from ats.helper import build_documents
+from ats.batch import rank_batch, rankings_to_dataframe
+from ats.ranking import score_jd, rerank_components, TOP_N, PREFILTER_K
+from tools.model import client_tool, embed_model_tool
+from parsing.jobs import ingest, resume_jobs
+from tools.downloader import download_report
+from tools.metrics import load_events, new_totals, add_event, prometheus_text, summarize
+from parsing.candidate_pool import candidate_pool_tool
+
+def print_progress(progress):
+    done = progress["parsed"] + progress["failed"]
+    print(f"\r[{progress['job_id']}] {done}/{progress['total']} files, {progress['failed']} failed", end="", flush=True)
+
+def print_error(filepath, error):
+    print(f"\nError processing resume {Path(filepath).name}: {error}", file=sys.stderr)
+
+def print_summary(progress):
+    print(f"\n[{progress['job_id']}] {progress['parsed']} parsed, {progress['failed']} failed, "
+          f"{len(progress['ignored'])} ignored in {progress['finished'] - progress['created']:.1f}s")
+    for ignored in progress["ignored"]:
+        print(f"  ignored: {ignored}")
+    if progress["downloads"]:
+        print(download_report(progress["downloads"]))
+    if progress["note"]:
+        print(progress["note"])
+
+def ingest_command(args):
+    print_summary(ingest(args.paths, print_progress, print_error))
+    print(f"Candidate pool: {len(candidate_pool_tool())} resumes")
+
+def resume_command(args):
+    finished = resume_jobs(print_progress, print_error)
+    for progress in finished:
+        print_summary(progress)
+    if not finished:
+        print("No interrupted jobs to resume")
+
+def rank_command(args):
+    rows = pd.read_csv(args.pool_csv, keep_default_na=False) if args.pool_csv else pd.DataFrame(candidate_pool_tool().rows())
+    if rows.empty:
+        print("Candidate pool is empty, run ingest first", file=sys.stderr)
+        return 1
+
+    docs = build_documents(rows)
+    jd_paths = [Path(p) for p in args.jd_files]
+    jd_texts = [p.read_text() for p in jd_paths]
+    client, job_schema, embed_model = client_tool(), jd_schema(), embed_model_tool()
+
+    # One JD takes the UI's prefilter cascade, several share candidate-side work through the batch path
+    if len(jd_texts) == 1:
+        on_progress = lambda fraction, message: print(message)
+        components, _, _ = score_jd(docs, jd_texts[0], client, job_schema, embed_model, args.prefilter_k, on_progress)
+        rankings = [rerank_components(components, args.top_n)]
+    else:
+        rankings = rank_batch(docs, jd_texts, client, job_schema, embed_model, top_n=args.top_n)
+
+    rankings_to_dataframe(docs, [p.stem for p in jd_paths], rankings).to_csv(args.out, index=False)
+    print(f"Ranked {len(docs)} candidates against {len(jd_paths)} JDs -> {args.out}")
+
+def metrics_command(args):
+    # Read from the JSON-lines log, so it covers the app, the service and earlier CLI runs alike
+    events = load_events()
+    if args.run:
+        breakdown = pd.DataFrame(summarize([e for e in events if e.get("run") == args.run]))
+        print(breakdown.round(2).to_string(index=False) if not breakdown.empty else f"No events for run {args.run}")
+        return
+
+    totals = new_totals()
+    for event in events:
+        add_event(totals, event)
+    print(prometheus_text(totals), end="")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resume ingestion and ranking without the Streamlit app")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="Parse PDFs, directories of PDFs and zip archives into the candidate pool")
+    ingest_parser.add_argument("paths", nargs="+")
+    ingest_parser.set_defaults(handler=ingest_command)
+
+    resume_parser = commands.add_parser("resume", help="Finish ingestion jobs interrupted by a crash or restart")
+    resume_parser.set_defaults(handler=resume_command)
+
+    rank_parser = commands.add_parser("rank", help="Rank the candidate pool against job description files")
+    rank_parser.add_argument("jd_files", nargs="+", help="Job description text files")
+    rank_parser.add_argument("--pool-csv", help="Rank parsed resumes exported from the app instead of the stored pool")
+    rank_parser.add_argument("--top-n", type=int, default=TOP_N)
+    rank_parser.add_argument("--prefilter-k", type=int, default=PREFILTER_K)
+    rank_parser.add_argument("--out", default="rankings.csv")
+    rank_parser.set_defaults(handler=rank_command)
+
+    metrics_parser = commands.add_parser("metrics", help="Per-stage metrics from the event log")
+    metrics_parser.add_argument("--run", help="Breakdown of one run, e.g. job-<job_id>")
+    metrics_parser.set_defaults(handler=metrics_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
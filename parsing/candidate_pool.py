@@ -0,0 +1,126 @@
+import json
+import time
+import sqlite3
+import threading
+from tools.storage import cache_path_tool
+
+class CandidatePool:
+    # Persistent parsed candidates keyed by resume content hash. resume_path is the unique stored file name,
+    # so two different resumes uploaded under the same name are two candidates
+
+    def __init__(self, path=None):
+        self.path = str(path or cache_path_tool("candidate_pool.sqlite"))
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+
+        # Pools from before were keyed by file name, their rows move over under their content hash
+        columns = {name: pk for _, name, _, _, _, pk in self._conn.execute("PRAGMA table_info(candidates)")}
+        if columns.get("resume_path"):
+            self._conn.execute("ALTER TABLE candidates RENAME TO candidates_by_name")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS candidates (
+                file_hash TEXT PRIMARY KEY,
+                resume_path TEXT NOT NULL,
+                row TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                updated REAL NOT NULL
+            )
+            """
+        )
+        if columns.get("resume_path"):
+            self._conn.execute(
+                "INSERT OR IGNORE INTO candidates SELECT file_hash, resume_path, "
+                "json_set(row, '$.file_name', resume_path), seq, updated FROM candidates_by_name"
+            )
+            self._conn.execute("DROP TABLE candidates_by_name")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_candidates_seq ON candidates(seq)")
+
+        # Bumped in the same transaction as every change, readers in other processes can tell snapshots apart
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (version INTEGER NOT NULL)")
+        if self._conn.execute("SELECT COUNT(*) FROM meta").fetchone()[0] == 0:
+            self._conn.execute("INSERT INTO meta VALUES (0)")
+        self._conn.commit()
+
+    # The UI, the CLI and the service write the same file, so nothing about its rows is cached in the process
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+
+    def is_current(self, file_hash):
+        # Same bytes as a stored candidate, whatever the file is called, nothing to parse or index
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM candidates WHERE file_hash = ?", (file_hash,)).fetchone() is not None
+
+    def upsert(self, rows, file_hashes):
+        # New content is appended, a re-parse of stored content replaces the row in place so pool order stays stable.
+        # One write transaction: seq and the added/updated split cannot race another process
+        changes = {"added": 0, "updated": 0}
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for row in rows:
+                    resume_path = row['resume_path']
+                    file_hash = file_hashes[resume_path]
+                    exists = self._conn.execute("SELECT 1 FROM candidates WHERE file_hash = ?", (file_hash,)).fetchone()
+                    self._conn.execute(
+                        "INSERT INTO candidates SELECT ?, ?, ?, COALESCE(MAX(seq), 0) + 1, ? FROM candidates WHERE true "
+                        "ON CONFLICT(file_hash) DO UPDATE SET resume_path = excluded.resume_path, row = excluded.row, "
+                        "updated = excluded.updated",
+                        (file_hash, resume_path, json.dumps(row), time.time())
+                    )
+                    changes["updated" if exists else "added"] += 1
+                self._bump()
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return changes
+
+    def remove(self, resume_paths):
+        with self._lock:
+            self._conn.executemany("DELETE FROM candidates WHERE resume_path = ?", [(p,) for p in resume_paths])
+            self._bump()
+            self._conn.commit()
+
+    def _bump(self):
+        self._conn.execute("UPDATE meta SET version = version + 1")
+
+    def version(self):
+        with self._lock:
+            return self._conn.execute("SELECT version FROM meta").fetchone()[0]
+
+    def snapshot(self):
+        # (version, rows) read in one transaction, so the rows are exactly that version
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                version = self._conn.execute("SELECT version FROM meta").fetchone()[0]
+                rows = self._conn.execute("SELECT row FROM candidates ORDER BY seq").fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+        return version, [json.loads(row) for (row,) in rows]
+
+    def rows(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT row FROM candidates ORDER BY seq").fetchall()
+        return [json.loads(row) for (row,) in rows]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM candidates")
+            self._bump()
+            self._conn.commit()
+
+_candidate_pool = None
+
+def candidate_pool_tool():
+    # Shared pool instance, survives Streamlit reruns because modules are imported once
+    global _candidate_pool
+    if _candidate_pool is None:
+        _candidate_pool = CandidatePool()
+    return _candidate_pool
@@ -0,0 +1,77 @@
+import re
+import hashlib
+import numpy as np
+from collections import defaultdict
+
+NUM_PERM = 128
+LSH_BANDS = 16  # 16 bands x 8 rows, candidate pairs start around 0.7 Jaccard
+SHINGLE_WORDS = 5
+NEAR_DUPLICATE_THRESHOLD = 0.85
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+WORD_PATTERN = re.compile(r"\w+")
+
+def shingle_hashes(text, size=SHINGLE_WORDS):
+    words = WORD_PATTERN.findall(text.lower())
+    shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles],
+        dtype=np.uint64
+    )
+
+class MinHasher:
+    # Universal hashing (a*x + b) mod p over 32-bit shingle hashes, products stay inside uint64
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        hashes = shingle_hashes(text)
+        permuted = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME
+        return (permuted & np.uint64(0xFFFFFFFF)).min(axis=0).astype(np.uint32)
+
+class DedupIndex:
+    # Exact duplicates by content hash, near duplicates by MinHash LSH, no pairwise comparison
+
+    def __init__(self, bands=LSH_BANDS, num_perm=NUM_PERM, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.exact = {}
+        self.signatures = {}
+        self.buckets = defaultdict(list)
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def match_exact(self, file_hash, key):
+        # Returns the representative for this content, registering key as one if the content is new
+        representative = self.exact.setdefault(file_hash, key)
+        if representative != key:
+            self.exact_duplicates += 1
+            return representative
+        return None
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def match_near(self, text, key):
+        # Returns the representative of the closest LSH candidate above threshold, else registers key
+        signature = self.hasher.signature(text)
+        band_keys = self._band_keys(signature)
+
+        best, best_similarity = None, self.threshold
+        for candidate in {c for band_key in band_keys for c in self.buckets.get(band_key, ())}:
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+
+        if best is not None:
+            self.near_duplicates += 1
+            return best
+
+        self.signatures[key] = signature
+        for band_key in band_keys:
+            self.buckets[band_key].append(key)
+        return None
@@ -0,0 +1,344 @@
+import os
+import json
+import time
+import random
+import asyncio
+import openai
+import multiprocessing
+import concurrent.futures
+from collections import defaultdict
+from tools.time import time_tool
+from tools.storage import sha256_file
+from tools.metrics import metrics_tool, record_llm_call
+from tools.model import async_client_tool
+from parsing.dedup import DedupIndex
+from parsing.parse_cache import parse_cache_tool
+from parsing.resume_formatting import resume_json_2_row
+from parsing.resume_processing import resume_extract_info, resume_request, resume_response_2_json, parser_version
+
+REQUESTS_PER_MIN = int(os.getenv("OPENAI_RPM", 500))
+TOKENS_PER_MIN = int(os.getenv("OPENAI_TPM", 200_000))
+MAX_CONCURRENCY = 64
+MAX_RETRIES = 6
+EXTRACT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+EXTRACTED_QUEUE_SIZE = 32
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+IMAGE_PAGE_TOKENS = 1500  # high-detail page image, rough upper bound
+MAX_OUTPUT_TOKENS = 2000
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+class TokenBucket:
+    # Continuous refill at per_minute / 60 per second, waiters are served in arrival order
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def adjust(self, amount):
+        # Give back (or charge) the difference between the estimate and the real usage
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class AdaptiveConcurrency:
+    # AIMD limit: +1 after a full window of successes, halved at most once per window on 429s.
+    # acquire hands out the current epoch; a 429 from a request started before the last cut
+    # was already answered by it, so only requests of the current epoch can halve again
+
+    def __init__(self, initial, minimum=1, maximum=MAX_CONCURRENCY):
+        self.limit = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._successes = 0
+        self._epoch = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            return self._epoch
+
+    async def release(self, epoch, rate_limited=False):
+        async with self._condition:
+            self.in_flight -= 1
+            if rate_limited:
+                if epoch == self._epoch:
+                    self.limit = max(self.minimum, self.limit // 2)
+                    self._successes = 0
+                    self._epoch += 1
+            else:
+                self._successes += 1
+                if self._successes >= self.limit:
+                    self.limit = min(self.maximum, self.limit + 1)
+                    self._successes = 0
+            self._condition.notify_all()
+
+def backoff_delay(attempt, error=None):
+    # Full-jitter exponential backoff, never shorter than the server's retry-after hint
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+
+    try:
+        return max(delay, float(retry_after)) if retry_after else delay
+    except ValueError:
+        return delay
+
+def timed_extract_info(filepath):
+    # Runs in an extraction process, timing it there keeps pool queueing out of the measurement
+    start = time.perf_counter()
+    resume_info = resume_extract_info(filepath)
+    return resume_info, time.perf_counter() - start
+
+def estimate_request_tokens(resume_info):
+    text_tokens = len(resume_info.get("resume_text") or "") // 4
+    image_tokens = IMAGE_PAGE_TOKENS * len(resume_info.get("page_images") or [])
+    return text_tokens + image_tokens + MAX_OUTPUT_TOKENS
+
+class ExtractionEngine:
+    # Two overlapping stages: PDF extraction in a process pool feeding rate-limited async LLM calls
+
+    def __init__(self, current_month_year=None, cache=None, requests_per_min=REQUESTS_PER_MIN,
+                 tokens_per_min=TOKENS_PER_MIN, initial_concurrency=8, max_concurrency=MAX_CONCURRENCY,
+                 max_retries=MAX_RETRIES, skip=None):
+        self.current_month_year = current_month_year or time_tool()
+        self.version = parser_version(self.current_month_year)
+        self.cache = cache or parse_cache_tool()
+        self.requests_per_min = requests_per_min
+        self.tokens_per_min = tokens_per_min
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.skip = skip  # skip(filepath, file_hash) -> True for files that need no parse at all
+        self.retries = 0
+        self.rate_limited = 0
+        self.skipped = 0
+        self.file_hashes = {}  # resume_path -> content hash of every parsed row
+
+    async def complete(self, client, resume_info):
+        request = resume_request(resume_info, self.current_month_year)
+        estimate = estimate_request_tokens(resume_info)
+        payload_bytes = len(json.dumps(request["messages"]))
+
+        for attempt in range(self.max_retries + 1):
+            await self.request_bucket.acquire()
+            await self.token_bucket.acquire(estimate)
+            epoch = await self.concurrency.acquire()
+
+            start = time.perf_counter()
+            try:
+                response = await client.chat.completions.create(**request)
+            except RETRYABLE_ERRORS as e:
+                rate_limited = isinstance(e, openai.RateLimitError)
+                record_llm_call(start, request["model"], "resume", payload_bytes, attempt,
+                                "rate_limited" if rate_limited else "retryable_error")
+                await self.concurrency.release(epoch, rate_limited=rate_limited)
+                self.rate_limited += rate_limited
+
+                # Quota exhaustion is a 429 too, but waiting will not fix it
+                if attempt == self.max_retries or getattr(e, "code", None) == "insufficient_quota":
+                    raise
+                self.retries += 1
+                await asyncio.sleep(backoff_delay(attempt, e))
+                continue
+            except Exception:
+                record_llm_call(start, request["model"], "resume", payload_bytes, attempt, "error")
+                await self.concurrency.release(epoch)
+                raise
+
+            record_llm_call(start, request["model"], "resume", payload_bytes, attempt, response=response)
+            await self.concurrency.release(epoch)
+            if getattr(response, "usage", None) is not None:
+                self.token_bucket.adjust(estimate - response.usage.total_tokens)
+            return resume_response_2_json(response)
+
+    async def llm_stage(self, client, filepath, file_hash, resume_info):
+        tool_args = await self.complete(client, resume_info)
+        flat_data = resume_json_2_row(tool_args)
+        self.cache.put(file_hash, self.version, tool_args, flat_data)
+        return tool_args, flat_data
+
+    async def run_async(self, filepaths, on_progress=None, on_error=None, on_extracted=None, on_result=None):
+        # on_extracted(filepath, file_hash) fires when a file is queued for the LLM, on_result(filepath, file_hash,
+        # flat_data) when it is done without error (flat_data is None for skipped files)
+        # Limiters are bound to the running loop, so they are created per run
+        self.request_bucket = TokenBucket(self.requests_per_min)
+        self.token_bucket = TokenBucket(self.tokens_per_min)
+        self.concurrency = AdaptiveConcurrency(self.initial_concurrency, maximum=self.max_concurrency)
+        self.dedup = DedupIndex()
+
+        loop = asyncio.get_running_loop()
+        client = async_client_tool()
+        extract_pool = extract_pool_tool()
+        total = len(filepaths) if hasattr(filepaths, "__len__") else None
+
+        # Bounded hand-off between stages: a full queue stalls extraction, which stalls intake
+        extracted = asyncio.Queue(maxsize=EXTRACTED_QUEUE_SIZE)
+        extract_slots = asyncio.Semaphore(EXTRACT_WORKERS * 2)
+        extract_tasks = set()
+        followers = set()
+        parses = {}  # representative path -> future of (tool_args, flat_data, error)
+        results = []
+        completed = 0
+
+        def finish(filepath, flat_data=None, error=None, file_hash=None):
+            nonlocal completed
+            if error is None and on_result:
+                try:
+                    on_result(filepath, file_hash, flat_data)
+                except Exception as e:
+                    # A failed checkpoint (PDF copy, pool write) fails this file only
+                    flat_data, error = None, e
+
+            if flat_data is not None:
+                flat_data['resume_path'] = os.path.basename(filepath)
+                self.file_hashes[flat_data['resume_path']] = file_hash
+                results.append(flat_data)
+            elif error is not None and on_error:
+                on_error(filepath, error)
+
+            completed += 1
+            if on_progress:
+                on_progress(completed, total)
+
+        async def follow(representative, filepath, file_hash, exact):
+            # Duplicates reuse their representative's parse instead of making their own LLM call. Only exact
+            # duplicates persist it, a near-duplicate's own bytes must get their own parse in a later run
+            tool_args, flat_data, error = await parses[representative]
+            if filepath in parses and not parses[filepath].done():
+                parses[filepath].set_result((tool_args, flat_data, error))
+
+            if error is not None:
+                finish(filepath, error=error)
+            else:
+                if exact:
+                    self.cache.put(file_hash, self.version, tool_args, flat_data)
+                finish(filepath, defaultdict(str, flat_data), file_hash=file_hash)
+
+        def start_follow(representative, filepath, file_hash, exact):
+            task = asyncio.create_task(follow(representative, filepath, file_hash, exact))
+            followers.add(task)
+
+        async def extract(filepath):
+            # CPU-bound PDF work runs in worker processes, cache hits and duplicates never reach the LLM stage
+            parse = None
+            try:
+                file_hash = await asyncio.to_thread(sha256_file, filepath)
+                if self.skip is not None and self.skip(filepath, file_hash):
+                    self.skipped += 1
+                    finish(filepath, file_hash=file_hash)
+                    return
+
+                cached = self.cache.get(file_hash, self.version)
+                if cached is not None:
+                    finish(filepath, defaultdict(str, cached[1]), file_hash=file_hash)
+                    return
+
+                representative = self.dedup.match_exact(file_hash, filepath)
+                if representative is not None:
+                    start_follow(representative, filepath, file_hash, exact=True)
+                    return
+
+                parse = parses[filepath] = loop.create_future()
+                resume_info, seconds = await loop.run_in_executor(extract_pool, timed_extract_info, filepath)
+                metrics_tool().record(
+                    "resume_extract_info", seconds, count=1, bytes=os.path.getsize(filepath),
+                    chars=len(resume_info.get("resume_text") or ""), scanned_pages=len(resume_info.get("page_images") or [])
+                )
+
+                if resume_info.get("resume_text"):
+                    representative = self.dedup.match_near(resume_info["resume_text"], filepath)
+                    if representative is not None:
+                        start_follow(representative, filepath, file_hash, exact=False)
+                        return
+
+                if on_extracted:
+                    on_extracted(filepath, file_hash)
+                await extracted.put((filepath, file_hash, resume_info))
+            except Exception as e:
+                if parse is not None and not parse.done():
+                    parse.set_result((None, None, e))
+                finish(filepath, error=e)
+            finally:
+                extract_slots.release()
+
+        async def intake():
+            # Pull paths lazily so streamed sources (zip members, downloads) overlap with parsing
+            iterator = iter(filepaths)
+            while True:
+                await extract_slots.acquire()
+                filepath = await asyncio.to_thread(next, iterator, None)
+                if filepath is None:
+                    extract_slots.release()
+                    break
+
+                task = asyncio.create_task(extract(filepath))
+                extract_tasks.add(task)
+                task.add_done_callback(extract_tasks.discard)
+
+            if extract_tasks:
+                await asyncio.gather(*list(extract_tasks))
+            for _ in range(self.max_concurrency):
+                await extracted.put(None)
+
+        async def llm_worker():
+            # Workers only hold a queue slot, the adaptive limiter decides how many calls are really in flight
+            while True:
+                item = await extracted.get()
+                if item is None:
+                    return
+
+                filepath, file_hash, resume_info = item
+                try:
+                    tool_args, flat_data = await self.llm_stage(client, filepath, file_hash, resume_info)
+                except Exception as e:
+                    parses[filepath].set_result((None, None, e))
+                    finish(filepath, error=e)
+                    continue
+
+                # Resolved once, followers must not wait on this file's bookkeeping
+                parses[filepath].set_result((tool_args, flat_data, None))
+                finish(filepath, flat_data, file_hash=file_hash)
+
+        try:
+            await asyncio.gather(intake(), *(llm_worker() for _ in range(self.max_concurrency)))
+            # Every representative has resolved by now, so followers only have bookkeeping left
+            if followers:
+                await asyncio.gather(*followers)
+        finally:
+            await client.close()
+        return results
+
+    def run(self, filepaths, on_progress=None, on_error=None, on_extracted=None, on_result=None):
+        return asyncio.run(self.run_async(filepaths, on_progress, on_error, on_extracted, on_result))
+
+_extract_pool = None
+
+def extract_pool_tool():
+    # Long-lived so worker start-up (fitz, imports) is paid once per server process
+    global _extract_pool
+    if _extract_pool is None:
+        _extract_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _extract_pool
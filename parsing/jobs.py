@@ -0,0 +1,372 @@
+import os
+import json
+import time
+import uuid
+import socket
+import shutil
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+from tools.time import time_tool
+from tools.storage import cache_path_tool
+from tools.metrics import metrics_tool
+from tools.file_handler import FileHandlerProcessor
+from parsing.candidate_pool import candidate_pool_tool
+from parsing.extraction_engine import ExtractionEngine
+
+RESUME_DIR = Path("temp_resumes")  # PDFs of pooled candidates, served by the results view
+IDLE_POLL_SECONDS = 2.0
+STAGING_POLL_SECONDS = 0.5
+JOB_CONCURRENCY = 8
+LEASE_SECONDS = 300  # a job whose owner has been silent this long is picked up by another runner
+
+# Job: staging -> running -> done. File: pending -> extracted -> parsed | failed
+FILE_STATES = ("pending", "extracted", "parsed", "failed")
+
+class JobStore:
+    # SQLite checkpoint of every ingestion job and the state of each of its files
+
+    def __init__(self, path=None):
+        self.path = str(path or cache_path_tool("jobs.sqlite"))
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                status TEXT NOT NULL,
+                staged INTEGER NOT NULL DEFAULT 0,
+                ignored TEXT NOT NULL DEFAULT '[]',
+                note TEXT,
+                owner TEXT,
+                heartbeat REAL,
+                created REAL NOT NULL,
+                finished REAL
+            );
+            CREATE TABLE IF NOT EXISTS job_files (
+                job_id TEXT NOT NULL,
+                filepath TEXT NOT NULL,
+                state TEXT NOT NULL,
+                file_hash TEXT,
+                error TEXT,
+                updated REAL NOT NULL,
+                PRIMARY KEY (job_id, filepath)
+            );
+            CREATE INDEX IF NOT EXISTS idx_job_files_state ON job_files(job_id, state);
+            """
+        )
+
+        # Stores created before leases and download reports existed get those columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL"), ("downloads", "TEXT")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._conn.commit()
+
+    def _write(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor.rowcount
+
+    def _read(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def create_job(self, source, owner):
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        self._write(
+            "INSERT INTO jobs (job_id, source, status, owner, heartbeat, created) VALUES (?, ?, 'staging', ?, ?, ?)",
+            (job_id, source, owner, now, now)
+        )
+        return job_id
+
+    def claim(self, job_id, owner):
+        # Lease: a job belongs to one runner at a time, stale leases are taken over
+        now = time.time()
+        return self._write(
+            "UPDATE jobs SET owner = ?, heartbeat = ? WHERE job_id = ? AND status != 'done' "
+            "AND (owner IS NULL OR owner = ? OR heartbeat < ?)",
+            (owner, now, job_id, owner, now - LEASE_SECONDS)
+        ) == 1
+
+    def touch(self, job_id):
+        self._write("UPDATE jobs SET heartbeat = ? WHERE job_id = ?", (time.time(), job_id))
+
+    def add_file(self, job_id, filepath):
+        self._write("INSERT OR IGNORE INTO job_files VALUES (?, ?, 'pending', NULL, NULL, ?)", (job_id, filepath, time.time()))
+        self.touch(job_id)
+
+    def finish_staging(self, job_id, ignored=(), note=None):
+        self._write("UPDATE jobs SET staged = 1, ignored = ?, note = COALESCE(?, note) WHERE job_id = ?",
+                    (json.dumps(list(ignored)), note, job_id))
+
+    def set_downloads(self, job_id, stats):
+        self._write("UPDATE jobs SET downloads = ? WHERE job_id = ?", (json.dumps(stats), job_id))
+
+    def set_state(self, job_id, filepath, state, file_hash=None, error=None):
+        with self._lock:
+            now = time.time()
+            self._conn.execute(
+                "UPDATE job_files SET state = ?, file_hash = COALESCE(?, file_hash), error = ?, updated = ? WHERE job_id = ? AND filepath = ?",
+                (state, file_hash, error, now, job_id, filepath)
+            )
+            self._conn.execute("UPDATE jobs SET heartbeat = ? WHERE job_id = ?", (now, job_id))
+            self._conn.commit()
+
+    def fail_open_files(self, job_id, error):
+        self._write(
+            "UPDATE job_files SET state = 'failed', error = ?, updated = ? WHERE job_id = ? AND state IN ('pending', 'extracted')",
+            (error, time.time(), job_id)
+        )
+
+    def set_status(self, job_id, status):
+        finished = time.time() if status == "done" else None
+        self._write("UPDATE jobs SET status = ?, finished = ? WHERE job_id = ?", (status, finished, job_id))
+
+    def open_files(self, job_id):
+        # Extracted-but-unparsed files go back through extraction, it is cheap next to the LLM call
+        rows = self._read("SELECT filepath FROM job_files WHERE job_id = ? AND state IN ('pending', 'extracted')", (job_id,))
+        return [filepath for (filepath,) in rows]
+
+    def job(self, job_id):
+        rows = self._read("SELECT job_id, source, status, staged, ignored, note, created, finished, downloads FROM jobs WHERE job_id = ?", (job_id,))
+        if not rows:
+            return None
+        job_id, source, status, staged, ignored, note, created, finished, downloads = rows[0]
+        return {
+            "job_id": job_id, "source": source, "status": status, "staged": bool(staged),
+            "ignored": json.loads(ignored), "note": note, "created": created, "finished": finished,
+            "downloads": json.loads(downloads) if downloads else None,
+        }
+
+    def progress(self, job_id):
+        job = self.job(job_id)
+        counts = dict(self._read("SELECT state, COUNT(*) FROM job_files WHERE job_id = ? GROUP BY state", (job_id,)))
+        job.update({state: counts.get(state, 0) for state in FILE_STATES})
+        job["total"] = sum(counts.values())
+        job["errors"] = self._read("SELECT filepath, error FROM job_files WHERE job_id = ? AND state = 'failed'", (job_id,))
+        return job
+
+    def unfinished_jobs(self):
+        return [job_id for (job_id,) in self._read("SELECT job_id FROM jobs WHERE status != 'done' ORDER BY created")]
+
+    def orphaned_staging(self):
+        # Jobs still staging whose owner went silent, their source died with it
+        rows = self._read("SELECT job_id FROM jobs WHERE status != 'done' AND staged = 0 AND COALESCE(heartbeat, 0) < ?",
+                          (time.time() - LEASE_SECONDS,))
+        return [job_id for (job_id,) in rows]
+
+    def recent_jobs(self, limit=10):
+        return [self.job(job_id) for (job_id,) in self._read("SELECT job_id FROM jobs ORDER BY created DESC LIMIT ?", (limit,))]
+
+class JobRunner:
+    # Runs ingestion jobs, every file transition is checkpointed so a restart resumes from the open files.
+    # The UI runs one in a background thread (start), the CLI drives jobs in the foreground (run_job)
+
+    def __init__(self, store=None, pool=None, concurrency=JOB_CONCURRENCY):
+        self.store = store or JobStore()
+        self.pool = pool or candidate_pool_tool()
+        self.concurrency = concurrency
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="ingestion-jobs", daemon=True)
+                self._thread.start()
+
+    def recover(self):
+        # Staging sources (uploads, archives, link lists) died with their process, keep what was saved
+        for job_id in self.store.orphaned_staging():
+            self.store.finish_staging(job_id, note="staging interrupted by a restart, resumed with the files saved so far")
+
+    def _stage(self, job_id, stage):
+        # Files are registered once fully written, so parsing can start on them while staging continues
+        job_dir = cache_path_tool("jobs", job_id, "files", "_").parent
+        processor = FileHandlerProcessor()
+        processor.output_dir = job_dir
+        ignored = []
+        note = None
+
+        with metrics_tool().run(job_run_id(job_id)):
+            try:
+                for filepath in stage(processor, ignored):
+                    self.store.add_file(job_id, str(filepath))
+                    self._wake.set()
+            except Exception as e:
+                note = f"staging failed: {e}"
+            finally:
+                if processor.download_stats is not None:
+                    self.store.set_downloads(job_id, processor.download_stats)
+                self.store.finish_staging(job_id, ignored, note)
+                self._wake.set()
+
+    def create(self, source, stage):
+        # stage(processor, ignored) yields saved PDF paths, it runs in its own thread
+        job_id = self.store.create_job(source, self.owner)
+        threading.Thread(target=self._stage, args=(job_id, stage), name=f"stage-{job_id}", daemon=True).start()
+        return job_id
+
+    def submit(self, source, stage):
+        # Background job, picked up by this runner's worker thread
+        self.start()
+        job_id = self.create(source, stage)
+        self._wake.set()
+        return job_id
+
+    def submit_uploads(self, uploaded_files):
+        return self.submit("upload", stage_uploads(uploaded_files))
+
+    def submit_urls(self, urls):
+        return self.submit("urls", lambda processor, ignored: processor.iter_url_pdfs(urls, ignored))
+
+    def submit_zip(self, zip_file):
+        # The upload belongs to the UI session, it is spooled to disk in chunks now and staging streams from there
+        archive = tempfile.TemporaryFile(dir=cache_path_tool("jobs", "_").parent)
+        zip_file.seek(0)
+        shutil.copyfileobj(zip_file, archive)
+        archive.seek(0)
+
+        def stage(processor, ignored):
+            with archive:
+                yield from processor.iter_zip_pdfs(archive, ignored)
+        return self.submit("zip", stage)
+
+    def _loop(self):
+        while True:
+            self.recover()
+            job_id = next((j for j in self.store.unfinished_jobs() if self.store.claim(j, self.owner)), None)
+            if job_id is None:
+                self._wake.wait(IDLE_POLL_SECONDS)
+                self._wake.clear()
+                continue
+            try:
+                self.run_job(job_id)
+            except Exception as e:
+                # A broken job must not stall the queue, its unparsed files are failed with the reason, not dropped
+                self.store.fail_open_files(job_id, f"job stopped: {e}")
+                self.store.finish_staging(job_id, note=f"job stopped: {e}")
+                self.store.set_status(job_id, "done")
+
+    def run_job(self, job_id, on_progress=None, on_error=None):
+        # Foreground run until every file of the job is parsed or failed.
+        # on_progress(progress) gets the job's checkpoint counts, on_error(filepath, error) each failure
+        if not self.store.claim(job_id, self.owner):
+            raise RuntimeError(f"job {job_id} is finished or owned by another runner")
+        self.store.set_status(job_id, "running")
+
+        while True:
+            filepaths = self.store.open_files(job_id)
+            if filepaths:
+                self._parse(job_id, filepaths, on_progress, on_error)
+            elif self.store.job(job_id)["staged"]:
+                break
+            else:
+                self.store.touch(job_id)
+                self._wake.wait(STAGING_POLL_SECONDS)
+                self._wake.clear()
+
+        self.store.set_status(job_id, "done")
+        shutil.rmtree(cache_path_tool("jobs", job_id, "files", "_").parent.parent, ignore_errors=True)
+        return self.store.progress(job_id)
+
+    def _parse(self, job_id, filepaths, on_progress=None, on_error=None):
+        RESUME_DIR.mkdir(parents=True, exist_ok=True)
+
+        def report():
+            if on_progress:
+                on_progress(self.store.progress(job_id))
+
+        def on_extracted(filepath, file_hash):
+            self.store.set_state(job_id, filepath, "extracted", file_hash)
+
+        def on_result(filepath, file_hash, flat_data):
+            # Checkpoint: the row is in the pool and the PDF next to the others before the file counts as parsed
+            if flat_data is not None:
+                resume_path = stored_resume_name(filepath, file_hash)
+                flat_data['resume_path'], flat_data['file_name'] = resume_path, Path(filepath).name
+                shutil.copyfile(filepath, RESUME_DIR / resume_path)
+                self.pool.upsert([flat_data], {resume_path: file_hash})
+            self.store.set_state(job_id, filepath, "parsed", file_hash)
+            report()
+
+        def on_failed(filepath, error):
+            self.store.set_state(job_id, filepath, "failed", error=str(error))
+            if on_error:
+                on_error(filepath, error)
+            report()
+
+        skip = lambda filepath, file_hash: self.pool.is_current(file_hash)
+        engine = ExtractionEngine(current_month_year=time_tool(), initial_concurrency=self.concurrency, skip=skip)
+        with metrics_tool().run(job_run_id(job_id)):
+            engine.run(filepaths, on_error=on_failed, on_extracted=on_extracted, on_result=on_result)
+
+def stored_resume_name(filepath, file_hash):
+    # Unique per content, the uploaded name is kept in the row's file_name for display
+    return f"{file_hash[:16]}_{Path(filepath).name}"
+
+def job_run_id(job_id):
+    # Metrics run of a job, its staging thread and every parse pass add to the same breakdown
+    return f"job-{job_id}"
+
+def stage_uploads(uploaded_files):
+    # Upload contents are read now, the objects belong to the UI session
+    files = [(f.name, f.getvalue()) for f in uploaded_files]
+
+    def stage(processor, ignored):
+        processor.output_dir.mkdir(parents=True, exist_ok=True)
+        for name, data in files:
+            if not name.lower().endswith('.pdf'):
+                ignored.append(name)
+                continue
+            filepath = processor.unique_path(name)
+            filepath.write_bytes(data)
+            yield filepath
+    return stage
+
+def stage_paths(paths):
+    # Local PDFs and directories are parsed in place, zip archives are streamed into the job directory
+    def stage(processor, ignored):
+        for path in map(Path, paths):
+            if path.is_dir():
+                yield from sorted(str(p) for p in path.rglob("*") if p.is_file() and p.suffix.lower() == ".pdf")
+            elif path.suffix.lower() == ".zip":
+                with open(path, "rb") as archive:
+                    yield from processor.iter_zip_pdfs(archive, ignored)
+            elif path.suffix.lower() == ".pdf" and path.is_file():
+                yield str(path)
+            else:
+                ignored.append(str(path))
+    return stage
+
+def ingest(paths, on_progress=None, on_error=None, runner=None):
+    # Headless ingestion into the candidate pool through the same checkpointed job path the UI uses
+    runner = runner or JobRunner()
+    job_id = runner.create("paths", stage_paths(paths))
+    return runner.run_job(job_id, on_progress, on_error)
+
+def resume_jobs(on_progress=None, on_error=None, runner=None):
+    # Finish every unfinished job nobody else holds, e.g. after a crashed nightly import
+    runner = runner or JobRunner()
+    runner.recover()
+    return [runner.run_job(job_id, on_progress, on_error) for job_id in runner.store.unfinished_jobs()
+            if runner.store.claim(job_id, runner.owner)]
+
+_job_runner = None
+
+def job_runner_tool():
+    # Started on first use, lives as long as the server process, not the browser session
+    global _job_runner
+    if _job_runner is None:
+        _job_runner = JobRunner()
+        _job_runner.start()
+    return _job_runner
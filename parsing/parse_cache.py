@@ -0,0 +1,121 @@
+import json
+import time
+import sqlite3
+import threading
+from tools.storage import cache_path_tool
+
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+class ParseCache:
+    # Persistent parse results keyed by PDF sha256 + parser version, LRU-evicted by payload size
+
+    def __init__(self, path=None, max_bytes=MAX_CACHE_BYTES):
+        self.path = str(path or cache_path_tool("parse_cache.sqlite"))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS parses (
+                file_hash TEXT NOT NULL,
+                version TEXT NOT NULL,
+                tool_args TEXT NOT NULL,
+                flat_data TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (file_hash, version)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_parses_last_used ON parses(last_used)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM parses").fetchone()[0]
+
+    def get(self, file_hash, version):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tool_args, flat_data FROM parses WHERE file_hash = ? AND version = ?",
+                (file_hash, version)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE parses SET last_used = ? WHERE file_hash = ? AND version = ?",
+                (time.time(), file_hash, version)
+            )
+            self._conn.commit()
+        return json.loads(row[0]), json.loads(row[1])
+
+    def put(self, file_hash, version, tool_args, flat_data):
+        tool_args_json = json.dumps(tool_args)
+        flat_data_json = json.dumps(flat_data)
+        size = len(tool_args_json) + len(flat_data_json)
+
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM parses WHERE file_hash = ? AND version = ?",
+                (file_hash, version)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parses VALUES (?, ?, ?, ?, ?, ?)",
+                (file_hash, version, tool_args_json, flat_data_json, size, time.time())
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Drop least recently used entries until the payload fits the budget
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT file_hash, version, size FROM parses ORDER BY last_used LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+
+            for file_hash, version, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute(
+                    "DELETE FROM parses WHERE file_hash = ? AND version = ?",
+                    (file_hash, version)
+                )
+                self._total_bytes -= size
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM parses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": self._total_bytes,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM parses")
+            self._conn.commit()
+            self._total_bytes = 0
+
+_parse_cache = None
+
+def parse_cache_tool():
+    # Shared cache instance, survives Streamlit reruns because modules are imported once
+    global _parse_cache
+    if _parse_cache is None:
+        _parse_cache = ParseCache()
+    return _parse_cache
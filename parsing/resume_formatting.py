@@ -1,5 +1,8 @@
 import os
 from collections import defaultdict
+from tools.storage import sha256_file
+from parsing.parse_cache import parse_cache_tool
+from parsing.resume_processing import parser_version
 from parsing.resume_processing import resume_text_2_json
 from parsing.resume_processing import resume_extract_info
 
@@ -62,9 +65,21 @@ def resume_json_2_row(tool_args):
 
     return flat_data
 
-def resume_process(filepath, current_month_year, client):
-    resume_info = resume_extract_info(filepath)
-    tool_args = resume_text_2_json(resume_info, current_month_year, client)
-    flat_data = resume_json_2_row(tool_args)
+def resume_process(filepath, current_month_year, client, cache=None):
+    cache = cache or parse_cache_tool()
+    file_hash = sha256_file(filepath)
+    version = parser_version(current_month_year)
+
+    # Re-submitted resumes skip PDF extraction and the LLM call entirely
+    cached = cache.get(file_hash, version)
+    if cached is not None:
+        _, flat_data = cached
+        flat_data = defaultdict(str, flat_data)
+    else:
+        resume_info = resume_extract_info(filepath)
+        tool_args = resume_text_2_json(resume_info, current_month_year, client)
+        flat_data = resume_json_2_row(tool_args)
+        cache.put(file_hash, version, tool_args, flat_data)
+
     flat_data['resume_path'] = os.path.basename(filepath)
-    return flat_data
\ No newline at end of file
+    return flat_data
@@ -1,30 +1,42 @@
 import os
 import json
 import fitz
-import time
-import streamlit as st
-from pathlib import Path
 from tools.schema import schema_tool
-from pdf2image import convert_from_path
-from tools.image import create_multimodal_message_tool
+from tools.storage import sha256_text
+from tools.image import create_multimodal_message_tool, image_to_data_url_tool
 
-def resume_extract_info(file_path):
+TEXT_MODEL = "gpt-4.1-mini-2025-04-14"
+VISION_MODEL = "gpt-4.1-2025-04-14"
+FALLBACK_MAX_SIDE = int(os.getenv("FALLBACK_MAX_SIDE", 1600))  # pixels, longest side of a rendered page
+FALLBACK_JPEG_QUALITY = 80
+FALLBACK_MAX_PAGES = 4
+
+def render_page_jpeg(page, max_side=FALLBACK_MAX_SIDE, quality=FALLBACK_JPEG_QUALITY):
+    # Render one page in memory, scaled so its longest side is max_side pixels (never above 300 DPI)
+    zoom = min(max_side / max(page.rect.width, page.rect.height), 300 / 72)
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+    return pixmap.tobytes("jpeg", jpg_quality=quality)
+
+def resume_extract_info(file_path, max_image_pages=FALLBACK_MAX_PAGES):
 
     all_links = []
     sorted_text_blocks = []
+    page_images = []
     doc = fitz.open(file_path)
 
-    for page in doc:
+    for page_number, page in enumerate(doc, start=1):
         for link in page.get_links(): # Extract links
             if "uri" in link:
                 all_links.append(link["uri"])
 
         blocks = page.get_text("blocks", sort=True) # Extract and sort text blocks
         sorted_blocks = sorted(blocks, key=lambda b: (b[1], b[0]))
+        page_text_blocks = [block[4].strip() for block in sorted_blocks if block[4].strip()]
+        sorted_text_blocks.extend(page_text_blocks)
 
-        for block in sorted_blocks:
-            if block[4].strip():
-                sorted_text_blocks.append(block[4].strip())
+        # Scanned pages have images but no text layer, blank pages are skipped
+        if not page_text_blocks and page.get_images() and len(page_images) < max_image_pages:
+            page_images.append((page_number, image_to_data_url_tool(render_page_jpeg(page))))
 
     resume_text = ""
     if all_links:
@@ -34,24 +46,13 @@ def resume_extract_info(file_path):
         resume_text += f"*Text extracted from the resume:*\n"
         resume_text += "\n\n".join(sorted_text_blocks)
 
-    if not blocks: # If resumes are images, extract file paths
-        images = convert_from_path(file_path, dpi=300)
-        img_paths = []
-        base = Path(file_path).stem
-
-        for i, img in enumerate(images):
-            img_path = f"{base}_page_{i+1}.png"
-            img.save(img_path, "PNG")
-            img_paths.append(img_path)
-        resume_text = None
-        return {"fallback_img_paths": img_paths}
-    
-    return {"resume_text": resume_text}
+    if page_images: # Scanned pages go to the vision model, along with any text the other pages had
+        return {"resume_text": resume_text or None, "page_images": page_images}
 
-def resume_text_2_json(resume_info, current_month_year, client):
-    tools = schema_tool()
+    return {"resume_text": resume_text}
 
-    prompt = f"""
+def resume_prompt(current_month_year):
+    return f"""
     You are an intelligent resume parser. From the resume text below, extract and return a JSON object with the following fields. 
     Maintain structure strictly, even if some fields are missing (use null, empty string, or empty array as needed). Use consistent formatting as per the schema expectations:
 
@@ -72,96 +73,45 @@ def resume_text_2_json(resume_info, current_month_year, client):
     Respond ONLY with a valid JSON object. No commentary.
     """
 
-    if resume_info.get("resume_text"):
-        resume_text = resume_info["resume_text"]
-
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini-2025-04-14",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": resume_text}
-            ],
-            temperature=0.1,
-            tools=tools,
-            tool_choice={"type": "function", "function": {"name": "extract_resume_info"}}
-        )
-    
-    elif resume_info.get("fallback_img_paths"):
-        img_paths = resume_info["fallback_img_paths"]
-        messages = create_multimodal_message_tool(img_paths, prompt)
-
-        response = client.chat.completions.create(
-            model="gpt-4.1-2025-04-14",
-            messages=messages,
-            temperature=0.1,
-            tools=tools,
-            tool_choice={"type": "function", "function": {"name": "extract_resume_info"}}
-        )
-
-        for img_path in img_paths:
-            os.remove(img_path)
-    
-    return json.loads(response.choices[0].message.tool_calls[0].function.arguments)
-
-def process_resumes(processor, max_workers):
-    start_time = time.time()
-    results = []
-    ignored_files = []
-
-    if st.session_state.last_upload.get('type') == 'file':
-        files = st.session_state.last_upload.get('files')
-
-        if files:
-            saved_files, ignored = processor.process_uploaded_files(files)
-            ignored_files.extend(ignored)
+def parser_version(current_month_year):
+    # Cache namespace, changes whenever the schema, prompt or models change
+    with open('resume_schema.json', 'r') as file:
+        schema = file.read()
+    return sha256_text("\n".join([schema, resume_prompt(current_month_year), TEXT_MODEL, VISION_MODEL]))
 
-            if saved_files:
-                results = processor.process_resumes_parallel(saved_files, max_workers)
-
-    elif st.session_state.last_upload.get('type') == 'url':
-        urls_text = st.session_state.last_upload.get('urls_text', "")
-
-        if urls_text.strip():
-            urls = [url.strip() for url in urls_text.split('\n') if url.strip()]
-            downloaded_files = []
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-
-            for i, url in enumerate(urls):
-                progress_bar.progress((i + 1) / len(urls))
-
-                if 'drive.google.com' in url:
-                    filepath, ignored = processor.download_from_gdrive(url, progress_bar, status_text)
-                else:
-                    filepath = processor.download_from_url(url, progress_bar, status_text)
-                    filepath, ignored = processor.download_from_gdrive(url, progress_bar, status_text)
-
-                if filepath:
-                    downloaded_files.append(filepath)
-                if ignored:
-                    ignored_files.append(ignored)
-
-            if downloaded_files:
-                results = processor.process_resumes_parallel(downloaded_files, max_workers)
-
-    elif st.session_state.last_upload.get('type') == 'zip':
-        zip_file = st.session_state.last_upload.get('zip_file')
-
-        if zip_file:
-            extracted_files, ignored = processor.process_zip_file(zip_file)
-            ignored_files.extend(ignored)
+def resume_request(resume_info, current_month_year):
+    # Chat-completions arguments shared by the sync and async parsers
+    tools = schema_tool()
+    prompt = resume_prompt(current_month_year)
 
-            if extracted_files:
-                results = processor.process_resumes_parallel(extracted_files, max_workers)
+    if resume_info.get("page_images"):
+        page_images = resume_info["page_images"]
+        model = VISION_MODEL
+        messages = create_multimodal_message_tool(page_images, prompt, resume_info.get("resume_text"))
 
-    # Show ignored files/links if any
-    if ignored_files:
-        st.warning("The following files/links were ignored (not PDF or download failed):")
-        st.markdown("```text\n" + "\n".join(str(f) for f in ignored_files) + "\n```")
+    elif resume_info.get("resume_text"):
+        resume_text = resume_info["resume_text"]
+        model = TEXT_MODEL
+        messages = [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": resume_text}
+        ]
+
+    else:
+        raise ValueError("No text or images could be extracted from the resume")
+
+    return {
+        "model": model,
+        "messages": messages,
+        "temperature": 0.1,
+        "tools": tools,
+        "tool_choice": {"type": "function", "function": {"name": "extract_resume_info"}}
+    }
+
+def resume_response_2_json(response):
+    return json.loads(response.choices[0].message.tool_calls[0].function.arguments)
 
-    end_time = time.time()
-    elapsed_time = end_time - start_time
-    
-    st.session_state.processed_data = results
-    st.session_state.processing_complete = True
-    st.session_state.processing_time = elapsed_time
\ No newline at end of file
+def resume_text_2_json(resume_info, current_month_year, client):
+    request = resume_request(resume_info, current_month_year)
+    response = client.chat.completions.create(**request)
+    return resume_response_2_json(response)
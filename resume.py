@@ -2,7 +2,7 @@
 import os
 import io
 import re
-import json
+import time
 import shutil
 import numpy as np
 import pandas as pd
@@ -10,37 +10,39 @@ import streamlit as st
 from pathlib import Path
 from datetime import datetime
 from llama_index.core.settings import Settings
-from llama_index.core import Document, VectorStoreIndex
-from llama_index.embeddings.openai import OpenAIEmbedding
 
 # Import custom libraries
 from dotenv import load_dotenv
 from ats.schema import jd_schema
-from ats.helper import row_to_text
-from tools.model import client_tool
-from tools.render import render_candidate
-from ats.helper import generate_multiqueries
-from tools.file_handler import FileHandlerProcessor
-from parsing.resume_processing import process_resumes
-from ats.scorer import compute_bm25_filtered_scores, compute_jaccard_filtered_scores, compute_node_scores
+from ats.helper import build_documents
+from tools.model import client_tool, embed_model_tool
+from tools.metrics import metrics_tool
+from tools.render import render_candidate, render_run_breakdown
+from parsing.parse_cache import parse_cache_tool
+from parsing.candidate_pool import candidate_pool_tool
+from parsing.jobs import job_runner_tool, job_run_id, RESUME_DIR
+from tools.downloader import download_report
+from ats.batch import rank_batch, rankings_to_dataframe
+from ats.ranking import score_jd, rank_candidates, ranking_recall, rerank_components
+from ats.ranking import PREFILTER_K, TOP_N, MIN_RAW_SCORE, RAW_WEIGHTS, FINAL_WEIGHTS
 
 # Import env variables and config
 load_dotenv()
 API_KEY = os.getenv("OPENAI_API_KEY")
-TOP_N = 15
-MIN_RAW_SCORE = 25
 
 client = client_tool()
 job_schema = jd_schema()
+pool = candidate_pool_tool()
 
 # Streamlit config
 st.set_page_config(page_title="Resume Processing System", page_icon="📄", layout="wide")
 
 # Session state variables
+# The candidate pool persists across sessions, a fresh session starts from it
 if 'processed_data' not in st.session_state:
-    st.session_state.processed_data = None
+    st.session_state.processed_data = pool.rows() or None
 if 'processing_complete' not in st.session_state:
-    st.session_state.processing_complete = False
+    st.session_state.processing_complete = len(pool) > 0
 if 'processing_time' not in st.session_state:
     st.session_state.processing_time = None
 if 'last_upload' not in st.session_state:
@@ -51,42 +53,38 @@ if 'last_ranking_jd' not in st.session_state:
     st.session_state.last_ranking_jd = ""
 if 'filtered_candidates' not in st.session_state:
     st.session_state.filtered_candidates = None
+if 'ranking_components' not in st.session_state:
+    st.session_state.ranking_components = None
+
+# Clean up temporary files
+def cleanup_temp_files():
+    try:
+        shutil.rmtree(RESUME_DIR)
+    except Exception as e:
+        st.warning(f"Could not clean up temporary files: {e}")
 
 # Clear Streamlit variables
-def clear_results(processor):
+def clear_results():
     st.session_state.processed_data = None
     st.session_state.processing_complete = False
     st.session_state.processing_time = None
     st.session_state.last_ranking_results = []
     st.session_state.last_ranking_jd = ""
     st.session_state.filtered_candidates = None
-    processor.cleanup_temp_files()
-
-# Clear temp directory
-def clear_temp_resumes():
-    output_dir = Path("temp_resumes")
-
-    if output_dir.exists():
-        for item in output_dir.iterdir():
-            if item.is_file() or item.is_symlink():
-                item.unlink()
-            elif item.is_dir():
-                shutil.rmtree(item)
-    else:
-        output_dir.mkdir(parents=True, exist_ok=True)
-    return output_dir
-
-# Normalize scores between 1-100
-def normalize(arr):
-    arr = np.array(arr)
-    if np.ptp(arr) < 1e-8:
-        # If all values are the same (or only one entry), set to 1
-        return np.ones_like(arr)
-    return (arr - np.min(arr)) / (np.ptp(arr) + 1e-8)
+    st.session_state.ranking_components = None
+    st.session_state.active_job = None
+    pool.clear()
+    cleanup_temp_files()
 
 # Variables
-max_workers = 8
-processor = FileHandlerProcessor()
+job_runner = job_runner_tool()
+
+# A new browser session picks up a job that is still running in the background
+if 'active_job' not in st.session_state:
+    unfinished = job_runner.store.unfinished_jobs()
+    st.session_state.active_job = unfinished[-1] if unfinished else None
+if 'processed_job' not in st.session_state:
+    st.session_state.processed_job = None
 
 # Sidebar Control Panel
 with st.sidebar:
@@ -135,32 +133,57 @@ st.markdown("<h4 style='text-align:center; color:grey; margin-top:0;'>Fast, Reli
 with st.container():
     st.divider()
 
-    # Possible upload options
+    # Possible upload options, each one becomes a background ingestion job
     if selected_option == "📁 File Upload":
         if st.session_state.last_upload.get('files'):
             if st.button("Process Uploaded Files", key="process_uploaded_main"):
-                with st.spinner("Processing uploaded files..."):
-                    output_dir = clear_temp_resumes()
-                    process_resumes(processor, max_workers)
+                st.session_state.active_job = job_runner.submit_uploads(st.session_state.last_upload['files'])
 
     elif selected_option == "🔗 URL/Links":
-        if st.session_state.last_upload.get('urls_text', "").strip():
+        urls_text = st.session_state.last_upload.get('urls_text', "")
+        if urls_text.strip():
             if st.button("Download and Process URLs", key="process_urls_main"):
-                with st.spinner("Downloading and processing URLs..."):
-                    output_dir = clear_temp_resumes()
-                    process_resumes(processor, max_workers)
+                urls = [url.strip() for url in urls_text.split('\n') if url.strip()]
+                st.session_state.active_job = job_runner.submit_urls(urls)
 
     elif selected_option == "📦 Zip Upload":
         if st.session_state.last_upload.get('zip_file'):
             if st.button("Extract and Process Zip", key="process_zip_main"):
-                with st.spinner("Extracting and processing zip file..."):
-                    output_dir = clear_temp_resumes()
-                    process_resumes(processor, max_workers)
+                st.session_state.active_job = job_runner.submit_zip(st.session_state.last_upload['zip_file'])
+
+    # Job progress comes from its checkpoints, the page polls instead of blocking on the parse
+    poll_job = False
+    if st.session_state.active_job:
+        job = job_runner.store.progress(st.session_state.active_job)
+        finished = job["parsed"] + job["failed"]
+        st.progress(finished / job["total"] if job["total"] else 0.0)
+        st.caption(f"Job {job['job_id']} ({job['source']}, {job['status']}): {job['parsed']} parsed, {job['failed']} failed, "
+                   f"{job['extracted']} waiting for the LLM, {job['pending']} pending")
+
+        if job["status"] != "done":
+            poll_job = True
+        else:
+            if job["ignored"]:
+                st.warning("The following files/links were ignored (not PDF or download failed):")
+                st.markdown("```text\n" + "\n".join(str(f) for f in job["ignored"]) + "\n```")
+            for filepath, error in job["errors"]:
+                st.error(f"Error processing resume {Path(filepath).name}: {error}")
+            if job["downloads"]:
+                st.caption(download_report(job["downloads"]))
+            if job["note"]:
+                st.info(job["note"])
+            render_run_breakdown(job_run_id(job["job_id"]), "⏱️ Ingestion Breakdown")
+
+            if st.session_state.processed_job != job["job_id"]:
+                st.session_state.processed_job = job["job_id"]
+                st.session_state.processed_data = pool.rows() or None
+                st.session_state.processing_complete = len(pool) > 0
+                st.session_state.processing_time = job["finished"] - job["created"]
 
     # Clear Results button, always visible if data exists
     if st.session_state.processed_data or st.session_state.processing_complete:
         if st.button("🗑️ Clear Results", key="clear_results_main"):
-            clear_results(processor)
+            clear_results()
             st.success("Results cleared. Ready for new processing!")
 
 # Results Area
@@ -172,18 +195,35 @@ if st.session_state.processing_complete and st.session_state.processed_data:
 
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total Processed", len(results))
+        st.metric("Candidates in Pool", len(results))
     with col2:
         st.metric("Success Rate", f"{len(results)}/{len(results)}")
     with col3:
         processing_time = st.session_state.processing_time
         st.metric("Processing Time (s)", f"{processing_time:.2f}" if processing_time is not None else "-")
 
+    cache_stats = parse_cache_tool().stats()
+    st.caption(f"Parse cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} stored resumes")
+
     # Display DataFrame preview
     df = pd.DataFrame(results)
     st.subheader("📋 Data Preview")
     st.dataframe(df.head(), use_container_width=True)
 
+    # Removing candidates only drops their rows, indexes of the remaining pool are reused as they are
+    with st.expander("🗂️ Manage Candidate Pool"):
+        file_names = dict(zip(df['resume_path'], df.get('file_name', df['resume_path']).fillna(df['resume_path'])))
+        to_remove = st.multiselect("Select resumes to remove from the pool", df['resume_path'].tolist(),
+                                   format_func=file_names.get, key="pool_remove")
+        if to_remove and st.button("Remove Selected", key="pool_remove_button"):
+            pool.remove(to_remove)
+            for resume_path in to_remove:
+                (RESUME_DIR / resume_path).unlink(missing_ok=True)
+            st.session_state.processed_data = pool.rows() or None
+            st.session_state.processing_complete = len(pool) > 0
+            st.session_state.ranking_components = None
+            st.rerun()
+
     # Download options
     col1, col2, col3, col4 = st.columns(4)
     ILLEGAL_CHARACTERS_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
@@ -225,95 +265,96 @@ if st.session_state.processing_complete and st.session_state.processed_data:
     st.subheader("Match Resumes to Job Description (Relative Candidate Ranking)")
     jd_text = st.text_area("Paste Job Description here", height=120)
 
+    col1, col2 = st.columns(2)
+    with col1:
+        prefilter_k = st.number_input("Prefilter top-K per signal, BM25 and vector index (0 scores every resume)", min_value=0, value=PREFILTER_K, step=50)
+    with col2:
+        measure_recall = st.checkbox("Measure prefilter recall against full scoring", value=False)
+
+    # Fusion weights and threshold, changing them re-ranks from the cached component scores without rescoring
+    with st.expander("⚖️ Scoring Weights"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            raw_node = st.slider("Embedding weight (raw score)", 0.0, 100.0, float(RAW_WEIGHTS[2]), 1.0)
+            final_node = st.slider("Embedding share (final score)", 0.0, 1.0, float(FINAL_WEIGHTS[2]), 0.05)
+        with col2:
+            raw_bm25 = st.slider("BM25 weight (raw score)", 0.0, 2.0, float(RAW_WEIGHTS[0]), 0.05)
+            final_bm25 = st.slider("BM25 share (final score)", 0.0, 1.0, float(FINAL_WEIGHTS[0]), 0.05)
+        with col3:
+            raw_jaccard = st.slider("Jaccard weight (raw score)", 0.0, 50.0, float(RAW_WEIGHTS[1]), 0.5)
+            final_jaccard = st.slider("Jaccard share (final score)", 0.0, 1.0, float(FINAL_WEIGHTS[1]), 0.05)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            min_raw_score = st.slider("Strong resume threshold (raw score)", 0.0, 100.0, float(MIN_RAW_SCORE), 1.0)
+        with col2:
+            top_n = st.number_input("Candidates shown", min_value=1, value=TOP_N, step=5)
+
+    raw_weights = np.array([raw_bm25, raw_jaccard, raw_node])
+    final_weights = np.array([final_bm25, final_jaccard, final_node])
+
     if jd_text.strip() and st.button("Sorting & Ranking Resumes by JD"):
         status_text = st.empty()
         progress = st.progress(0)
 
-        st.session_state["last_ranking_results"] = []
-        st.session_state["filtered_candidates"] = None
+        st.session_state["ranking_components"] = None
         dataframe = pd.DataFrame(st.session_state.processed_data)
 
         # Parsed data to Llamaindex Document & Embeddings
-        metadata_fields = ["Name", "Email", "Phone", "Education", "Job Title", "Experience", "resume_path"]
-        docs = [
-            Document(
-                text=row_to_text(row),
-                metadata={field: row[field] for field in metadata_fields}
-            )
-            for _, row in dataframe.iterrows()
-        ]
+        docs = build_documents(dataframe)
 
         # Llama-index Config
-        docs_dict = {doc.id_: doc for doc in docs}
-        Settings.embed_model = OpenAIEmbedding(model="text-embedding-3-small", api_key=API_KEY)
-
-        status_text.info("Indexing resumes...")
-        index = VectorStoreIndex.from_documents(docs)
-        progress.progress(0.15)
-        
-        # Multiquery Generation
-        status_text.info("Generating semantic multiqueries from JD...")
-        multiqueries = generate_multiqueries(client, job_schema, jd_text, n=4)
-        progress.progress(0.30)
-
-        # Scoring resumes
-        status_text.info("Computing resume scores...")
-        bm25_scores = compute_bm25_filtered_scores(docs, multiqueries)
-        jaccard_scores = compute_jaccard_filtered_scores(multiqueries, [doc.text_resource.text for doc in docs])
-        node_scores = compute_node_scores(docs, multiqueries, Settings.embed_model)
-
-        raw_scores = (50 * node_scores + 0.3 * bm25_scores + 20 * jaccard_scores)
-        progress.progress(0.80)
-
-        valid_idx = [i for i, s in enumerate(raw_scores) if s > MIN_RAW_SCORE]
-        if not valid_idx:
+        Settings.embed_model = embed_model_tool()
+
+        def on_progress(fraction, message):
+            status_text.info(message)
+            progress.progress(fraction)
+
+        with metrics_tool().run() as run_id:
+            components, multiqueries, pool_index = score_jd(docs, jd_text, client, job_schema, Settings.embed_model, prefilter_k, on_progress)
+
+            if measure_recall and len(components["candidate_idx"]) < len(docs):
+                status_text.info("Scoring the full pool to measure prefilter recall...")
+                ranking = rerank_components(components, top_n, min_raw_score, raw_weights, final_weights)
+                full_ranking = rank_candidates(docs, multiqueries, Settings.embed_model, top_n, min_raw_score, prefilter_k=0,
+                                               pool_index=pool_index, raw_weights=raw_weights, final_weights=final_weights)
+                st.caption(f"Prefilter recall@{top_n}: {ranking_recall(ranking, full_ranking):.0%} "
+                           f"({ranking['scored_count']} of {len(docs)} candidates fully scored)")
+
+        # Component scores are kept per JD, every later rerun only re-fuses them
+        st.session_state["ranking_components"] = components
+        st.session_state["ranking_docs"] = docs
+        st.session_state["ranking_dataframe"] = dataframe
+        st.session_state["last_ranking_jd"] = jd_text
+        st.session_state["ranking_run"] = run_id
+        status_text.empty()
+        progress.progress(1.0)
+
+    # Reranking candidates according to combined scores with the current weights
+    if st.session_state.get("ranking_components") is not None:
+        docs = st.session_state["ranking_docs"]
+        dataframe = st.session_state["ranking_dataframe"]
+        ranking = rerank_components(st.session_state["ranking_components"], top_n, min_raw_score, raw_weights, final_weights)
+
+        if not ranking["strong_count"]:
             st.warning("No strong resumes found, showing relative ranking of top candidates.")
-            valid_idx = list(range(len(docs)))  # fallback mechanism to show all
         else:
-            st.info(f"Found {len(valid_idx)} strong resumes, showing relative ranking of top candidates.")
-
-        # Filtering according to high-matching resumes
-        docs = [docs[i] for i in valid_idx]
-        bm25_scores = np.array(bm25_scores)[valid_idx]
-        jaccard_scores = np.array(jaccard_scores)[valid_idx]
-        node_scores = np.array(node_scores)[valid_idx]
-        raw_scores = np.array(raw_scores)[valid_idx]
-
-        # Normalizing scores for easy visuals
-        status_text.info("Normalizing and combining all scores...")
-        bm25_norm = normalize(bm25_scores)
-        jaccard_norm = normalize(jaccard_scores)
-        node_norm = normalize(node_scores)
-
-        final_scores = (0.5 * node_norm + 0.3 * bm25_norm + 0.2 * jaccard_norm) * 100
-        final_scores = np.clip(final_scores, 0, 100)
-        progress.progress(0.90)
-
-        # Reranking candidates according to combined scores
-        status_text.info("Sorting candidates and rendering results...")
-        reranked_idx = np.argsort(final_scores)[::-1]
-        top_candidates = [docs[i] for i in reranked_idx[:TOP_N]]
+            st.info(f"Found {ranking['strong_count']} strong resumes, showing relative ranking of top candidates.")
 
         # Storing final results
-        results = st.session_state.get("last_ranking_results", [])
-        for rank, i in enumerate(reranked_idx[:TOP_N]):
-            doc = docs[i]
+        top_candidates = [docs[i] for i in ranking["indices"]]
+        results = []
+        for doc, score in zip(top_candidates, ranking["scores"]):
             meta = doc.metadata
             results.append({
-                "Score": final_scores[i],
+                "Score": score,
                 "metadata": meta,
                 "Resume Text": doc.text_resource.text,
             })
-
         st.session_state["last_ranking_results"] = results
-        st.session_state["last_ranking_jd"] = jd_text
-        progress.progress(1.0)
 
         resume_paths = [doc.metadata['resume_path'] for doc in top_candidates]
-        filtered_dataframe = st.session_state.get("filtered_candidates", None)
-
-        filtered_dataframe = dataframe[dataframe['resume_path'].isin(resume_paths)]
-        st.session_state["filtered_candidates"] = filtered_dataframe
+        st.session_state["filtered_candidates"] = dataframe[dataframe['resume_path'].isin(resume_paths)]
 
     # UI for Top Candidates
     if st.session_state.get("last_ranking_results"):
@@ -321,6 +362,8 @@ if st.session_state.processing_complete and st.session_state.processed_data:
         filtered_dataframe = st.session_state.get("filtered_candidates", None)
 
         st.subheader("Relative Candidate Match")
+        if st.session_state.get("ranking_run"):
+            render_run_breakdown(st.session_state["ranking_run"], "⏱️ Ranking Breakdown")
         for candidate in results:
             render_candidate(
                 meta=candidate['metadata'],
@@ -355,4 +398,28 @@ if st.session_state.processing_complete and st.session_state.processed_data:
                 data=csv_buffer.getvalue(),
                 file_name=f"filtered_resumes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                 mime="text/csv"
-            )
\ No newline at end of file
+            )
+
+    # Batch ranking of the same pool against many JDs
+    with st.expander("Batch rank against multiple Job Descriptions"):
+        jd_files = st.file_uploader("Upload JD text files", type=['txt'], accept_multiple_files=True, key="batch_jds")
+
+        if jd_files and st.button("Rank Pool for All JDs"):
+            with st.spinner(f"Ranking candidates against {len(jd_files)} job descriptions..."):
+                docs = build_documents(pd.DataFrame(st.session_state.processed_data))
+                jd_texts = [f.read().decode("utf-8", errors="ignore") for f in jd_files]
+                rankings = rank_batch(docs, jd_texts, client, job_schema, embed_model_tool())
+                batch_dataframe = rankings_to_dataframe(docs, [Path(f.name).stem for f in jd_files], rankings)
+
+            st.dataframe(batch_dataframe, use_container_width=True)
+            st.download_button(
+                label="📄 Download Batch Rankings as CSV",
+                data=batch_dataframe.to_csv(index=False),
+                file_name=f"batch_rankings_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                mime="text/csv"
+            )
+
+# Poll the running ingestion job, the rest of the page has already rendered
+if poll_job:
+    time.sleep(1.0)
+    st.rerun()
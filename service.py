@@ -0,0 +1,286 @@
+# Standalone ranking service over the persistent candidate pool:
+#   python service.py --port 8080 --workers 4
+#   POST /rank    {"jd": "...", "top_n": 15}          ranked candidates for one job description
+#   POST /ingest  {"paths": [...]} or {"urls": [...]}  background ingestion job into the pool
+#   GET  /jobs/<job_id>                                ingestion job progress
+#   GET  /status                                       pool version, workers, queue and batch stats
+#   GET  /metrics                                      per-stage metrics in Prometheus text format
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
+import concurrent.futures
+import numpy as np
+import pandas as pd
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from dotenv import load_dotenv
+
+# Before the project imports, cache paths and rate limits are read from the environment at import time
+load_dotenv()
+
+from ats.schema import jd_schema
+from ats.ranking import TOP_N
+from ats.batch import score_snapshot, save_snapshot, load_snapshot, MAX_JD_WORKERS
+from ats.scorer import index_pool, embed_queries, embedding_model_name
+from ats.helper import build_documents, generate_multiqueries, METADATA_FIELDS
+from tools.model import client_tool, embed_model_tool
+from tools.metrics import metrics_tool, submit_in_context
+from parsing.jobs import stage_paths, job_runner_tool
+from parsing.candidate_pool import candidate_pool_tool
+
+RANK_WORKERS = int(os.getenv("RANK_WORKERS", "2"))
+BATCH_WINDOW_SECONDS = float(os.getenv("RANK_BATCH_WINDOW", "0.05"))  # how long a request waits for company
+MAX_BATCH = 16
+MULTIQUERIES = 4
+REQUEST_TIMEOUT_SECONDS = 600
+
+class RankingService:
+    # This process is the only writer: it embeds the pool and the queries, and builds the lexical shard set.
+    # Worker processes memory-map the same vectors and shards read-only, once per pool version
+
+    def __init__(self, workers=RANK_WORKERS):
+        self.pool = candidate_pool_tool()
+        self.runner = job_runner_tool()
+        self.client, self.job_schema, self.embed_model = client_tool(), jd_schema(), embed_model_tool()
+        self.model_name = embedding_model_name(self.embed_model)
+        self.workers = workers
+        self.stats = {"requests": 0, "batches": 0, "largest_batch": 0, "failed_requests": 0}
+        self._stats_lock = threading.Lock()  # batches finish on several threads
+
+        self._prepared = None
+        self._prepare_lock = threading.Lock()
+        version, _ = self.prepare()
+
+        # Workers load the prepared pool as they start, so the first request does not pay for it
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=load_snapshot, initargs=(version, self.model_name)
+        )
+        self.batches = concurrent.futures.ThreadPoolExecutor(workers)  # one batch in flight per worker process
+        self.requests = queue.Queue()
+        threading.Thread(target=self._collect, daemon=True).start()
+        self.runner.start()
+
+    def prepare(self):
+        # Index whatever the pool holds now, only texts new since the last version are tokenized or embedded
+        with self._prepare_lock:
+            if self._prepared is None or self._prepared[0] != self.pool.version():
+                version, rows = self.pool.snapshot()
+                docs = build_documents(pd.DataFrame(rows))
+                if docs:
+                    save_snapshot(version, docs, index_pool(docs, self.embed_model))
+                self._prepared = (version, docs)
+            return self._prepared
+
+    def rank(self, jd_text, top_n=TOP_N):
+        future = concurrent.futures.Future()
+        self.requests.put((jd_text, top_n, future))
+        return future.result(timeout=REQUEST_TIMEOUT_SECONDS)
+
+    def _collect(self):
+        # Requests arriving within one window share the query embedding call, the lexical pass and the vector pass
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + BATCH_WINDOW_SECONDS
+            while len(batch) < MAX_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.batches.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        with metrics_tool().run():
+            outcomes = self._rank_isolated([jd for jd, _, _ in batch], max(top_n for _, top_n, _ in batch))
+
+        with self._stats_lock:
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            self.stats["failed_requests"] += sum(isinstance(outcome, Exception) for outcome in outcomes)
+
+        for (_, top_n, future), outcome in zip(batch, outcomes):
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(dict(outcome, candidates=outcome["candidates"][:top_n]))
+
+    def _rank_isolated(self, jd_texts, top_n):
+        # One result or exception per JD. When the shared embedding or scoring step fails,
+        # each request is retried alone so one bad JD cannot fail the rest of its batch
+        try:
+            return self._rank_batch(jd_texts, top_n)
+        except Exception as e:
+            if len(jd_texts) == 1:
+                return [e]
+            return [self._rank_isolated([jd], top_n)[0] for jd in jd_texts]
+
+    def _rank_batch(self, jd_texts, top_n):
+        # A JD whose multiquery call failed gets its exception, the others are scored together
+        with concurrent.futures.ThreadPoolExecutor(MAX_JD_WORKERS) as executor:
+            futures = [submit_in_context(executor, generate_multiqueries, self.client, self.job_schema, jd, MULTIQUERIES)
+                       for jd in jd_texts]
+            outcomes = [future.exception() or future.result() for future in futures]
+
+        ok = [i for i, outcome in enumerate(outcomes) if not isinstance(outcome, Exception)]
+        if ok:
+            for i, result in zip(ok, self._score([outcomes[i] for i in ok], top_n)):
+                outcomes[i] = result
+        return outcomes
+
+    def _score(self, groups, top_n):
+        query_vectors = embed_queries([q for group in groups for q in group], self.embed_model)
+
+        # A pool change between prepare and the worker's read sends the batch round once more
+        for _ in range(2):
+            version, docs = self.prepare()
+            if not docs:
+                return [{"pool_version": version, "scored_count": 0, "strong_count": 0, "candidates": []} for _ in groups]
+            rankings = self.executor.submit(score_snapshot, version, self.model_name, groups, query_vectors, top_n).result()
+            if rankings is not None:
+                return [self._response(version, docs, ranking) for ranking in rankings]
+        raise RuntimeError("Candidate pool kept changing during ranking, retry the request")
+
+    def _response(self, version, docs, ranking):
+        candidates = []
+        for rank, (i, score) in enumerate(zip(ranking["indices"], ranking["scores"]), start=1):
+            candidate = {"rank": rank, "score": round(float(score), 2)}
+            candidate.update({field: docs[i].metadata.get(field, '') for field in METADATA_FIELDS})
+            candidates.append(candidate)
+        return {
+            "pool_version": version,
+            "scored_count": int(ranking["scored_count"]),
+            "strong_count": int(ranking["strong_count"]),
+            "candidates": candidates,
+        }
+
+    def ingest(self, paths=(), urls=()):
+        if urls:
+            return self.runner.submit_urls(list(urls))
+        return self.runner.submit("paths", stage_paths(list(paths)))
+
+    def stats_snapshot(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def status(self):
+        version, docs = self._prepared
+        return {
+            "pool_version": self.pool.version(),
+            "prepared_version": version,
+            "prepared_size": len(docs),
+            "workers": self.workers,
+            "queued": self.requests.qsize(),
+            "batch_window_seconds": BATCH_WINDOW_SECONDS,
+            **self.stats_snapshot(),
+            "unfinished_jobs": self.runner.store.unfinished_jobs(),
+        }
+
+def json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, default=json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == "/status":
+            self._send(200, service.status())
+        elif self.path == "/metrics":
+            # Scoring inside worker processes lands in the shared JSON-lines file, this is the server's own view
+            body = metrics_tool().prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path.startswith("/jobs/"):
+            job_id = self.path[len("/jobs/"):]
+            if service.runner.store.job(job_id) is None:
+                self._send(404, {"error": f"Unknown job {job_id}"})
+            else:
+                self._send(200, service.runner.store.progress(job_id))
+        else:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        try:
+            body = self._body()
+        except (ValueError, UnicodeDecodeError) as e:
+            self._send(400, {"error": f"Invalid JSON body: {e}"})
+            return
+        if not isinstance(body, dict):
+            self._send(400, {"error": "Body must be a JSON object"})
+            return
+
+        if self.path == "/rank":
+            jd_text = body.get("jd")
+            if not isinstance(jd_text, str) or not jd_text.strip():
+                self._send(400, {"error": "Field 'jd' must be a non-empty job description"})
+                return
+            # bool is an int subclass, and a negative top_n would slice from the end
+            top_n = body.get("top_n", TOP_N)
+            if not isinstance(top_n, int) or isinstance(top_n, bool) or top_n < 1:
+                self._send(400, {"error": "Field 'top_n' must be a positive integer"})
+                return
+            try:
+                self._send(200, service.rank(jd_text, top_n))
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+        elif self.path == "/ingest":
+            paths, urls = body.get("paths") or [], body.get("urls") or []
+            # A bare string would otherwise be ingested one character at a time
+            if not all(isinstance(v, list) and all(isinstance(i, str) for i in v) for v in (paths, urls)):
+                self._send(400, {"error": "Fields 'paths' and 'urls' must be lists of strings"})
+                return
+            if not paths and not urls:
+                self._send(400, {"error": "Give 'paths' (server-side PDFs, directories, zips) or 'urls'"})
+                return
+            self._send(202, {"job_id": service.ingest(paths, urls)})
+        else:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP ranking service over the persistent candidate pool")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=RANK_WORKERS, help="Ranking worker processes")
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((args.host, args.port), ServiceHandler)
+    server.service = RankingService(args.workers)
+    print(f"Serving {server.service.status()['prepared_size']} candidates on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.executor.shutdown(cancel_futures=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
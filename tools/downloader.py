@@ -0,0 +1,158 @@
+import os
+import re
+import hashlib
+import tempfile
+import requests
+import threading
+import concurrent.futures
+from pathlib import Path
+from urllib.parse import urlparse, urldefrag
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from tools.metrics import metrics_tool, submit_in_context
+
+MAX_DOWNLOAD_WORKERS = 16
+MAX_PER_HOST = 4
+MAX_DOWNLOAD_BYTES = 50 * 1024 * 1024
+DOWNLOAD_TIMEOUT = 30
+
+def gdrive_file_id(url):
+    if '/file/d/' in url:
+        return url.split('/file/d/')[1].split('/')[0]
+    elif 'id=' in url:
+        return url.split('id=')[1].split('&')[0]
+    return None
+
+def canonical_url(url):
+    # Same resource, same key: Drive links collapse to their file id, fragments are dropped
+    url = urldefrag(url.strip())[0]
+    if 'drive.google.com' in url:
+        file_id = gdrive_file_id(url)
+        return f"https://drive.google.com/uc?export=download&id={file_id}" if file_id else None
+    return url
+
+def download_report(stats):
+    # One line for the UI caption and the CLI summary
+    return (f"Downloads: {stats['downloaded']} of {stats['requested']} links saved ({stats['bytes'] / 1e6:.1f} MB), "
+            f"{stats['duplicates']} duplicates, {stats['failed']} failed")
+
+class UrlDownloader:
+    # Concurrent downloads over one keep-alive session, bounded per host, deduplicated by URL and content
+
+    def __init__(self, output_dir, max_workers=MAX_DOWNLOAD_WORKERS, max_per_host=MAX_PER_HOST):
+        self.output_dir = Path(output_dir)
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_per_host, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._host_slots = {}
+        self._seen_hashes = set()
+        self._lock = threading.Lock()
+        self.stats = {"requested": 0, "downloaded": 0, "duplicates": 0, "failed": 0, "bytes": 0}
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_slots[host]
+
+    def _filename(self, url, response):
+        disposition = response.headers.get('content-disposition', '')
+        match = re.search(r'filename="?([^";]+)"?', disposition)
+        filename = os.path.basename(match.group(1)) if match else os.path.basename(urlparse(url).path)
+        return filename if filename.lower().endswith('.pdf') else f"{filename or 'resume'}.pdf"
+
+    def _unique_path(self, filename):
+        filepath = self.output_dir / filename
+        counter = 1
+        while filepath.exists():
+            name, ext = os.path.splitext(filename)
+            filepath = self.output_dir / f"{name}_{counter}{ext}"
+            counter += 1
+        return filepath
+
+    def download(self, url):
+        # Streams to a temp file while hashing, returns (path, None) or (None, reason)
+        digest = hashlib.sha256()
+        size = 0
+        reason = None
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, suffix=".part")
+
+        try:
+            with self._host_slot(url), os.fdopen(fd, 'wb') as f, metrics_tool().span("download", host=urlparse(url).netloc) as span:
+                with self.session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                    response.raise_for_status()
+                    filename = self._filename(url, response)
+
+                    for chunk in response.iter_content(chunk_size=65536):
+                        if not size and not chunk.startswith(b"%PDF"):
+                            reason = "not a PDF"
+                            break
+                        size += len(chunk)
+                        if size > MAX_DOWNLOAD_BYTES:
+                            reason = "too large"
+                            break
+                        digest.update(chunk)
+                        f.write(chunk)
+                span.update(count=1, bytes=size, status="rejected" if reason else "ok")
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+        if reason or not size:
+            os.remove(tmp_path)
+            with self._lock:
+                self.stats["failed"] += 1
+            return None, reason or "empty response"
+
+        with self._lock:
+            content_hash = digest.hexdigest()
+            if content_hash in self._seen_hashes:
+                os.remove(tmp_path)
+                self.stats["duplicates"] += 1
+                return None, "duplicate content"
+            self._seen_hashes.add(content_hash)
+
+            filepath = self._unique_path(filename)
+            os.replace(tmp_path, filepath)
+            self.stats["downloaded"] += 1
+            self.stats["bytes"] += size
+        return str(filepath), None
+
+    def iter_downloads(self, urls, ignored_files):
+        # Yields saved PDF paths as downloads finish, so parsing starts before the last link is fetched
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        unique_urls = {}
+
+        for url in urls:
+            key = canonical_url(url)
+            if key is None:
+                ignored_files.append(f"{url} (no Google Drive file id)")
+            elif key in unique_urls:
+                ignored_files.append(f"{url} (duplicate link)")
+                self.stats["duplicates"] += 1
+            else:
+                unique_urls[key] = url
+        self.stats["requested"] = len(unique_urls)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {submit_in_context(executor, self.download, key): url for key, url in unique_urls.items()}
+
+            for future in concurrent.futures.as_completed(futures):
+                url = futures[future]
+                try:
+                    filepath, reason = future.result()
+                except Exception as e:
+                    filepath, reason = None, str(e)
+                    self.stats["failed"] += 1
+
+                if filepath:
+                    yield filepath
+                else:
+                    ignored_files.append(f"{url} ({reason})")
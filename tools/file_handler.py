@@ -1,182 +1,78 @@
 import os
-import shutil
 import zipfile
-import tempfile
-import requests
-import streamlit as st
 from pathlib import Path
-import concurrent.futures
-from tools.time import time_tool
-from urllib.parse import urlparse
-from typing import List, Optional
-from tools.model import client_tool
-from parsing.resume_formatting import resume_process
+from typing import Iterator, List
+from tools.downloader import UrlDownloader
+from tools.metrics import metrics_tool
+
+MAX_ZIP_MEMBER_BYTES = 50 * 1024 * 1024
+MAX_ZIP_COMPRESSION_RATIO = 100
 
 class FileHandlerProcessor:
     def __init__(self):
         self.output_dir = Path("temp_resumes")
+        self.download_stats = None  # filled by iter_url_pdfs, the job records it when staging ends
         
-    def download_from_url(self, url: str, progress_bar, status_text) -> Optional[str]:
-        # Download a PDF from URL with progress tracking
-
-        try:
-            status_text.text(f"Downloading from: {url}")
-            response = requests.get(url, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            # Extract filename from URL
-            parsed_url = urlparse(url)
-            filename = os.path.basename(parsed_url.path)
-            if not filename or not filename.endswith('.pdf'):
-                return None, url
-            
-            filepath = self.output_dir / filename
-            counter = 1
-            while filepath.exists():
-                name, ext = os.path.splitext(filename)
-                filepath = self.output_dir / f"{name}_{counter}{ext}"
-                counter += 1
-
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if total_size > 0:
-                        progress = downloaded / total_size
-                        progress_bar.progress(progress)
-            
-            return str(filepath), None
-            
-        except Exception as e:
-            st.error(f"Error downloading {url}: {e}")
-            return None, url
+    def iter_url_pdfs(self, urls: List[str], ignored_files: List[str]) -> Iterator[str]:
+        # Concurrent pooled downloads, deduplicated by link and by content
+        downloader = UrlDownloader(self.output_dir)
+        self.download_stats = downloader.stats
+        return downloader.iter_downloads(urls, ignored_files)
     
-    def extract_gdrive_file_id(self, gdrive_url: str) -> Optional[str]:
-        # Extract file ID from Google Drive URL
+    def unique_path(self, filename: str) -> Path:
+        # Avoid overwriting resumes that share a file name
+        filepath = self.output_dir / filename
+        counter = 1
+        while filepath.exists():
+            name, ext = os.path.splitext(filename)
+            filepath = self.output_dir / f"{name}_{counter}{ext}"
+            counter += 1
+        return filepath
 
-        if '/file/d/' in gdrive_url:
-            return gdrive_url.split('/file/d/')[1].split('/')[0]
-        elif 'id=' in gdrive_url:
-            return gdrive_url.split('id=')[1].split('&')[0]
-        elif '/open?id=' in gdrive_url:
-            return gdrive_url.split('/open?id=')[1].split('&')[0]
-        return None
-    
-    def download_from_gdrive(self, gdrive_url: str, progress_bar, status_text) -> Optional[str]:
-        # Download from Google Drive
+    def iter_zip_pdfs(self, zip_file, ignored_files: List[str]) -> Iterator[str]:
+        # Stream PDF members of an uploaded zip into temp_resumes one at a time, yielding each path
 
-        file_id = self.extract_gdrive_file_id(gdrive_url)
-        if not file_id:
-            st.error(f"Could not extract file ID from: {gdrive_url}")
-            return None, gdrive_url
-            
-        download_url = f"https://drive.google.com/uc?export=download&id={file_id}"
-        return self.download_from_url(download_url, progress_bar, status_text)
-    
-    def process_uploaded_files(self, uploaded_files: List) -> List[str]:
-        # Process files uploaded through Streamlit
-
-        saved_files = []
-        ignored_files = []
-
-        for uploaded_file in uploaded_files:
-            if uploaded_file.name.lower().endswith('.pdf'):
-                filepath = self.output_dir / uploaded_file.name
-                
-                # Handle duplicates
-                counter = 1
-                while filepath.exists():
-                    name, ext = os.path.splitext(uploaded_file.name)
-                    filepath = self.output_dir / f"{name}_{counter}{ext}"
-                    counter += 1
-                
-                with open(filepath, 'wb') as f:
-                    f.write(uploaded_file.read())
-                saved_files.append(str(filepath))
-            
-            else:
-                ignored_files.append(uploaded_file.name)
-        
-        return saved_files, ignored_files
-    
-    def process_zip_file(self, zip_file) -> List[str]:
-        # Extract PDFs from uploaded zip file
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            with zipfile.ZipFile(zip_file, 'r') as zip_ref:
+                for info in zip_ref.infolist():
+                    if info.is_dir():
+                        continue
 
-        extracted_files = []
-        ignored_files = []
+                    file = os.path.basename(info.filename)
+                    if not file.lower().endswith('.pdf') or info.filename.startswith('__MACOSX/'):
+                        ignored_files.append(file)
+                        continue
 
-        with tempfile.TemporaryDirectory() as temp_dir:
-            try:
-                zip_path = os.path.join(temp_dir, "uploaded.zip")
-                with open(zip_path, 'wb') as f:
-                    f.write(zip_file.read())
-                
-                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                    zip_ref.extractall(temp_dir)
-                
-                # Find all PDF files
-                for root, dirs, files in os.walk(temp_dir):
-                    for file in files:
-                        if file.lower().endswith('.pdf'):
-                            src_path = os.path.join(root, file)
-                            dst_path = self.output_dir / file
-                            
-                            # Handle duplicates
-                            counter = 1
-                            while dst_path.exists():
-                                name, ext = os.path.splitext(file)
-                                dst_path = self.output_dir / f"{name}_{counter}{ext}"
-                                counter += 1
-                            
-                            shutil.copy2(src_path, dst_path)
-                            extracted_files.append(str(dst_path))
-                        else:
-                            ignored_files.append(file)
-                            
-            except Exception as e:
-                st.error(f"Error processing zip file: {e}")
-                
-        return extracted_files, ignored_files
-    
-    def process_resumes_parallel(self, filepaths: List[str], max_workers: int = 8) -> List[dict]:
-        # Process resumes in parallel with progress tracking
+                    # Reject zip bombs up front from the central directory
+                    ratio = info.file_size / max(info.compress_size, 1)
+                    if info.file_size > MAX_ZIP_MEMBER_BYTES or ratio > MAX_ZIP_COMPRESSION_RATIO:
+                        ignored_files.append(f"{file} (exceeds size limits)")
+                        continue
 
-        valid_filepaths = [fp for fp in filepaths if fp.endswith('.pdf')]
-        results = []
+                    dst_path = self.unique_path(file)
+                    with metrics_tool().span("zip_extract", count=1, bytes=info.file_size) as span:
+                        copied = self.copy_zip_member(zip_ref, info, dst_path)
+                        span["status"] = "ok" if copied else "rejected"
+                    if copied:
+                        yield str(dst_path)
+                    else:
+                        ignored_files.append(f"{file} (exceeds size limits)")
 
-        if not valid_filepaths:
-            return results
-        
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(resume_process, filepath, time_tool(), client_tool()) for filepath in valid_filepaths]
-            
-            completed = 0
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    flat_data = future.result()
-                    results.append(flat_data)
-                    completed += 1
-                    progress = completed / len(futures)
-                    progress_bar.progress(progress)
-                    status_text.text(f"Processed {completed}/{len(futures)} resumes")
+        except zipfile.BadZipFile as e:
+            ignored_files.append(f"{getattr(zip_file, 'name', 'zip file')} ({e})")
 
-                except Exception as e:
-                    st.error(f"Error processing resume: {e}")
-                    completed += 1
-        
-        status_text.text("Processing complete!")
-        return results
-    
-    def cleanup_temp_files(self):
-        # Clean up temporary files
+    def copy_zip_member(self, zip_ref, info, dst_path: Path) -> bool:
+        # Headers can lie, so the limit is also enforced on the bytes actually decompressed
+        written = 0
+        with zip_ref.open(info) as src, open(dst_path, 'wb') as dst:
+            for chunk in iter(lambda: src.read(1 << 20), b""):
+                written += len(chunk)
+                if written > MAX_ZIP_MEMBER_BYTES:
+                    break
+                dst.write(chunk)
 
-        try:
-            shutil.rmtree(self.output_dir)
-        except Exception as e:
-            st.warning(f"Could not clean up temporary files: {e}")
\ No newline at end of file
+        if written > MAX_ZIP_MEMBER_BYTES:
+            dst_path.unlink()
+            return False
+        return True
@@ -1,20 +1,23 @@
 import base64
 
-def image_to_base64_tool(image_path):
-    with open(image_path, "rb") as img_f:
-        return "data:image/jpeg;base64," + base64.b64encode(img_f.read()).decode()
+def image_to_data_url_tool(image_bytes, mime="image/jpeg"):
+    return f"data:{mime};base64," + base64.b64encode(image_bytes).decode()
     
-def create_multimodal_message_tool(img_paths, prompt):
+def create_multimodal_message_tool(page_images, prompt, resume_text=None):
     messages = [{"role": "system", "content": prompt}]
 
-    for idx, img_path in enumerate(img_paths):
+    # Text from pages that had a text layer travels with the scanned page images
+    if resume_text:
+        messages.append({"role": "user", "content": resume_text})
+
+    for page_number, image_url in page_images:
         messages.append({
             "role": "user",
             "content": [
-                {"type": "text", "text": f"Page {idx + 1} of the resume:"},
-                {"type": "image_url", "image_url": {"url": image_to_base64_tool(img_path)}},
+                {"type": "text", "text": f"Page {page_number} of the resume:"},
+                {"type": "image_url", "image_url": {"url": image_url}},
             ]
         })
         
     messages.append({"role": "user", "content": [{"type": "text", "text": "Parse the attached resume (all pages) and return only JSON."}]})
-    return messages
\ No newline at end of file
+    return messages
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from pathlib import Path
+from contextlib import contextmanager
+from collections import OrderedDict, defaultdict
+from tools.storage import cache_path_tool
+
+SUMMED_FIELDS = ("count", "bytes", "prompt_tokens", "completion_tokens", "retries")
+MAX_RUNS = 50  # per-run breakdowns kept in memory for the UI
+# events.jsonl is rotated to events.jsonl.1 past this size, so at most twice this is kept on disk
+MAX_EVENTS_BYTES = int(os.getenv("METRICS_MAX_EVENTS_BYTES", str(64 * 1024 * 1024)))
+
+# Run the current stage belongs to: set by Metrics.run, inherited by asyncio tasks and copied into worker threads
+current_run = contextvars.ContextVar("metrics_run", default=None)
+
+def add_event(totals, event):
+    # Running sums per (stage, status), the shape both exporters read
+    bucket = totals[(event["stage"], event.get("status", "ok"))]
+    bucket["events"] += 1
+    bucket["seconds"] += event["seconds"]
+    for field in SUMMED_FIELDS:
+        value = event.get(field)
+        if isinstance(value, (int, float)):
+            bucket[field] += value
+
+def new_totals():
+    return defaultdict(lambda: defaultdict(float))
+
+def prometheus_text(totals):
+    # Prometheus text exposition format
+    metrics = [
+        ("resume_stage_seconds", "summary", "Time spent per pipeline stage", "seconds"),
+        ("resume_stage_items_total", "counter", "Items processed per stage (files, texts, candidates)", "count"),
+        ("resume_stage_bytes_total", "counter", "Payload bytes handled per stage", "bytes"),
+        ("resume_llm_prompt_tokens_total", "counter", "Prompt tokens reported by the API", "prompt_tokens"),
+        ("resume_llm_completion_tokens_total", "counter", "Completion tokens reported by the API", "completion_tokens"),
+        ("resume_llm_retries_total", "counter", "Attempts that were retries of an earlier failed call", "retries"),
+    ]
+    lines = []
+    for name, kind, help_text, field in metrics:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for (stage, status), bucket in sorted(totals.items()):
+            labels = f'stage="{stage}",status="{status}"'
+            if field == "seconds":
+                lines.append(f"{name}_sum{{{labels}}} {bucket['seconds']:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {int(bucket['events'])}")
+            elif bucket.get(field):
+                lines.append(f"{name}{{{labels}}} {bucket[field]:g}")
+    return "\n".join(lines) + "\n"
+
+def rotated_path(path):
+    return path.with_name(path.name + ".1")
+
+def load_events(path=None):
+    # Rotated events first, so the result stays in time order
+    path = Path(path or cache_path_tool("metrics", "events.jsonl"))
+    events = []
+    for part in (rotated_path(path), path):
+        if part.exists():
+            with open(part) as f:
+                events.extend(json.loads(line) for line in f if line.strip())
+    return events
+
+def summarize(events):
+    # Per-stage breakdown of one run, slowest stage first
+    stages = {}
+    for event in events:
+        row = stages.setdefault(event["stage"], {"stage": event["stage"], "calls": 0, "seconds": 0.0, "max_ms": 0.0,
+                                                 "errors": 0, **{field: 0 for field in SUMMED_FIELDS}})
+        row["calls"] += 1
+        row["seconds"] += event["seconds"]
+        row["max_ms"] = max(row["max_ms"], event["seconds"] * 1000)
+        row["errors"] += event.get("status", "ok") not in ("ok", "skipped")
+        for field in SUMMED_FIELDS:
+            value = event.get(field)
+            if isinstance(value, (int, float)):
+                row[field] += value
+
+    for row in stages.values():
+        row["mean_ms"] = row["seconds"] * 1000 / row["calls"]
+    return sorted(stages.values(), key=lambda row: row["seconds"], reverse=True)
+
+class Metrics:
+    # Stage events (duration, counts, payload sizes, tokens) appended as JSON lines, summed for Prometheus,
+    # and grouped per run for the UI breakdown. Stages that overlap (LLM calls in flight) each count their own time
+
+    def __init__(self, path=None):
+        self.path = Path(path or cache_path_tool("metrics", "events.jsonl"))
+        self.prometheus_path = self.path.with_name("metrics.prom")
+        self._lock = threading.Lock()
+        self._totals = new_totals()
+        self._runs = OrderedDict()
+
+    @contextmanager
+    def run(self, run_id=None):
+        # Every stage recorded inside the block, in this thread or tasks it spawns, is grouped under run_id.
+        # Entering the same id again (staging thread, then the job runner) adds to the same run
+        run_id = run_id or uuid.uuid4().hex[:12]
+        token = current_run.set(run_id)
+        try:
+            yield run_id
+        finally:
+            current_run.reset(token)
+            self.write_prometheus()
+
+    @contextmanager
+    def span(self, stage, **fields):
+        # Fields can be filled in inside the block: sizes, token counts, status
+        start_ts, start = time.time(), time.perf_counter()
+        try:
+            yield fields
+        except Exception:
+            fields.setdefault("status", "error")
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - start, ts=start_ts, **fields)
+
+    def record(self, stage, seconds, ts=None, **fields):
+        event = {"ts": ts or time.time() - seconds, "run": current_run.get(), "stage": stage, "seconds": seconds, **fields}
+        line = json.dumps(event, default=str)
+
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+                rotate = f.tell() > MAX_EVENTS_BYTES
+            if rotate:
+                # Renamed whole, other processes appending reopen the path on their next event
+                os.replace(self.path, rotated_path(self.path))
+            add_event(self._totals, event)
+            if event["run"] is not None:
+                self._runs.setdefault(event["run"], []).append(event)
+                self._runs.move_to_end(event["run"])
+                while len(self._runs) > MAX_RUNS:
+                    self._runs.popitem(last=False)
+
+    def run_events(self, run_id):
+        with self._lock:
+            return list(self._runs.get(run_id, []))
+
+    def run_summary(self, run_id):
+        events = self.run_events(run_id)
+        wall = max(e["ts"] + e["seconds"] for e in events) - min(e["ts"] for e in events) if events else 0.0
+        return summarize(events), wall
+
+    def prometheus(self):
+        with self._lock:
+            return prometheus_text(self._totals)
+
+    def write_prometheus(self):
+        # Textfile-collector friendly: written whole, then renamed over the old file
+        tmp_path = self.prometheus_path.with_suffix(f".{os.getpid()}.{uuid.uuid4().hex}.tmp")  # runs end on many threads
+        tmp_path.write_text(self.prometheus())
+        os.replace(tmp_path, self.prometheus_path)
+
+def record_llm_call(start, model, purpose, payload_bytes, attempt=0, status="ok", response=None):
+    # One chat-completions attempt, token counts come from the response when there is one
+    usage = getattr(response, "usage", None)
+    metrics_tool().record(
+        "llm_call", time.perf_counter() - start, model=model, purpose=purpose, bytes=payload_bytes,
+        retries=int(attempt > 0), attempt=attempt, status=status,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0, completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+    )
+
+def submit_in_context(executor, fn, *args):
+    # Thread pools do not inherit context variables, each task gets a copy so its stages keep the caller's run
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def metrics_tool():
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+        return _metrics
@@ -1,7 +1,19 @@
 import os
 from dotenv import load_dotenv
 from openai import OpenAI as OpenAIClient
+from openai import AsyncOpenAI as AsyncOpenAIClient
+from llama_index.embeddings.openai import OpenAIEmbedding
+
+EMBEDDING_MODEL = "text-embedding-3-small"
 
 load_dotenv()
 def client_tool():
-    return OpenAIClient(api_key=os.getenv("OPENAI_API_KEY"))
\ No newline at end of file
+    return OpenAIClient(api_key=os.getenv("OPENAI_API_KEY"))
+
+def async_client_tool():
+    # Retries are handled by the extraction engine, so the SDK's own retry loop is disabled
+    return AsyncOpenAIClient(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+def embed_model_tool():
+    # OPENAI_BASE_URL lets a local stand-in server replace the embeddings endpoint
+    return OpenAIEmbedding(model=EMBEDDING_MODEL, api_key=os.getenv("OPENAI_API_KEY"), api_base=os.getenv("OPENAI_BASE_URL"))
@@ -1,6 +1,9 @@
+import os
 import colorsys
+import pandas as pd
 from math import ceil
 import streamlit as st
+from tools.metrics import metrics_tool
 
 def score_to_color(score):
     hue = (score / 100) * 0.33
@@ -42,15 +45,33 @@ def render_candidate(meta, score):
         """, unsafe_allow_html=True)
 
         resume_path = "temp_resumes/" + meta.get('resume_path','')
-        if resume_path:
+        if os.path.isfile(resume_path):
             with open(resume_path, "rb") as f:
                 file_bytes = f.read()
             st.download_button(
                 label="📄 Download/View Resume",
                 data=file_bytes,
-                file_name=resume_path.split("/")[-1],
+                file_name=meta.get('file_name') or resume_path.split("/")[-1],
                 mime="application/pdf",
                 use_container_width=True,
                 key=f"download_{resume_path}"
             )
-        st.markdown("---")
\ No newline at end of file
+        st.markdown("---")
+
+def render_run_breakdown(run_id, title="⏱️ Run Breakdown"):
+    # Per-stage time, calls, payload and tokens of one run; concurrent stages (LLM calls, downloads) each count their own time
+    rows, wall = metrics_tool().run_summary(run_id)
+    if not rows:
+        return
+
+    with st.expander(f"{title} ({wall:.2f}s wall time)"):
+        breakdown = pd.DataFrame(rows)[["stage", "calls", "seconds", "mean_ms", "max_ms", "count", "bytes",
+                                        "prompt_tokens", "completion_tokens", "retries", "errors"]]
+        st.dataframe(breakdown.round(2), use_container_width=True, hide_index=True)
+        st.download_button(
+            label="Download metrics (Prometheus text)",
+            data=metrics_tool().prometheus(),
+            file_name="metrics.prom",
+            mime="text/plain",
+            key=f"metrics_{run_id}"
+        )
@@ -0,0 +1,24 @@
+import os
+import hashlib
+from pathlib import Path
+
+CACHE_ROOT = Path(os.getenv("RESUME_CACHE_DIR", ".cache"))
+
+def cache_path_tool(*parts):
+    # Path inside the persistent cache directory, parent folders created on demand
+    path = CACHE_ROOT.joinpath(*parts)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def sha256_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def sha256_file(file_path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()